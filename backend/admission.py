@@ -0,0 +1,97 @@
+import asyncio
+import os
+import signal
+from database import DB_POOL_OPTIONS
+from metrics import http_shed
+
+# Per-worker load shedding. Past these limits a request gets an immediate 503 with
+# Retry-After instead of queueing behind the others, so latency stays bounded under overload.
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "256"))
+# Requests already waiting for a pooled DB connection; the default is twice the pool size
+MAX_POOL_WAITERS = int(os.getenv("MAX_POOL_WAITERS", str(2 * DB_POOL_OPTIONS["max_size"])))
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "1"))
+
+# Scrapes, stats and long-lived streams are neither counted nor shed
+ADMISSION_EXEMPT_PATHS = ("/metrics", "/api/stats/", "/api/products/events")
+# Long-lived streams are still refused while draining: a new one would hold the worker
+# open until the graceful timeout, and the client reconnects to another worker anyway
+DRAIN_REFUSED_PATHS = ("/api/products/events",)
+
+BUSY_BODY = b'{"detail":"Server busy, retry shortly"}'
+
+
+# Shared admission state for one worker: requests in flight and whether it is draining
+class AdmissionControl:
+    def __init__(self, max_in_flight: int, max_pool_waiters: int, retry_after: int, pool_waiting):
+        self.max_in_flight = max_in_flight
+        self.max_pool_waiters = max_pool_waiters
+        self.retry_after = retry_after
+        # Callable returning how many requests wait for a DB connection right now
+        self.pool_waiting = pool_waiting
+        self.in_flight = 0
+        self.draining = False
+
+    # Why a new request should be turned away, or None to admit it
+    def shed_reason(self):
+        if self.draining:
+            return "draining"
+        if self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.pool_waiting() >= self.max_pool_waiters:
+            return "pool_waiters"
+        return None
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"].startswith(ADMISSION_EXEMPT_PATHS):
+            if self.control.draining and scope["path"].startswith(DRAIN_REFUSED_PATHS):
+                http_shed.inc(("draining",))
+                await self.reject(send, close=True)
+                return
+            await self.app(scope, receive, send)
+            return
+        reason = self.control.shed_reason()
+        if reason is not None:
+            http_shed.inc((reason,))
+            await self.reject(send, close=reason == "draining")
+            return
+        self.control.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.in_flight -= 1
+
+    async def reject(self, send, close: bool):
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(BUSY_BODY)).encode()),
+            (b"retry-after", str(self.control.retry_after).encode()),
+        ]
+        if close:
+            headers.append((b"connection", b"close"))
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": BUSY_BODY})
+
+
+# Run on_drain() as soon as this process is told to stop, before the server waits for
+# in-flight requests. Chains to the server's own SIGTERM/SIGINT handlers, which do the rest.
+def install_drain_handler(on_drain):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(on_drain)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
@@ -1,18 +1,103 @@
+import os
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
-from routes import users, admin, products , cart
-from database import connect_db, disconnect_db
+from routes import users, admin, products , cart, orders, monitoring, tokens
+from database import connect_db, disconnect_db, get_pool_stats, get_pool_waiting, replica_router
+from migrations import run_migrations
+from notifications import listener
+from cache import CATALOG_CHANNEL, catalog_cache
+from recommendations import recommendation_pool
+from events import PRODUCT_CHANNEL, product_events, stock_events
+from reservations import reservation_reaper
+from metrics import METRICS_DIR, METRICS_WRITE_INTERVAL, MetricsMiddleware, write_snapshot
+from background import BackgroundTask, run_every
+from replicas import ReadYourWritesMiddleware
+from admission import MAX_IN_FLIGHT, MAX_POOL_WAITERS, SHED_RETRY_AFTER, AdmissionControl, AdmissionMiddleware, install_drain_handler
+from auth import REVOCATION_CHANNEL, revocation_list
+from passwords import shutdown_executor
+from images import IMAGE_ROOT, ImmutableStaticFiles, shutdown_executor as shutdown_image_executor
 
-app = FastAPI()
+# Set RUN_MIGRATIONS=0 when migrations are run separately (python migrations.py)
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "1") == "1"
 
-# Event handler for application startup
-@app.on_event("startup")
-async def startup_event():
+# Keep every worker's catalog cache in sync through Postgres LISTEN/NOTIFY
+listener.subscribe(CATALOG_CHANNEL, catalog_cache.on_notify)
+listener.on_connect(catalog_cache.on_reconnect)
+listener.subscribe(CATALOG_CHANNEL, recommendation_pool.mark_stale)
+listener.subscribe(CATALOG_CHANNEL, replica_router.pin_all)
+listener.subscribe(REVOCATION_CHANNEL, revocation_list.on_notify)
+listener.on_connect(revocation_list.on_reconnect)
+
+# Fan product change events from the products trigger out to SSE clients
+listener.subscribe(PRODUCT_CHANNEL, product_events.on_notify)
+# Stock changes from checkout and reservation expiry reach the caches the same way
+listener.subscribe(PRODUCT_CHANNEL, catalog_cache.on_product_change)
+listener.subscribe(PRODUCT_CHANNEL, recommendation_pool.on_product_change)
+# Reads that refill the evicted entries must not pick up a lagging replica's quantities
+listener.subscribe(PRODUCT_CHANNEL, replica_router.pin_all)
+listener.on_connect(product_events.on_reconnect)
+
+# Load shedding state for this worker
+admission = AdmissionControl(MAX_IN_FLIGHT, MAX_POOL_WAITERS, SHED_RETRY_AFTER, get_pool_waiting)
+
+# With several workers, each one writes its metrics to METRICS_DIR for /metrics to merge
+async def write_metrics_snapshot():
+    write_snapshot(get_pool_stats())
+
+metrics_writer = BackgroundTask(partial(run_every, METRICS_WRITE_INTERVAL, write_metrics_snapshot, "Metrics snapshot"))
+
+# On SIGTERM: refuse new requests and end event streams so in-flight work can finish
+def begin_drain():
+    admission.draining = True
+    product_events.close()
+
+# Per-worker resources: opened when the worker starts, closed after it has drained
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     await connect_db()
+    await replica_router.start()
+    if RUN_MIGRATIONS:
+        await run_migrations()
+    await revocation_list.start()
+    await listener.start()
+    await recommendation_pool.start()
+    await reservation_reaper.start()
+    await stock_events.start()
+    if METRICS_DIR:
+        metrics_writer.start()
+    install_drain_handler(begin_drain)
+    try:
+        yield
+    finally:
+        begin_drain()
+        await reservation_reaper.stop()
+        await stock_events.stop()
+        await recommendation_pool.stop()
+        await listener.stop()
+        await revocation_list.stop()
+        await replica_router.stop()
+        await metrics_writer.stop()
+        if METRICS_DIR:
+            # Keep this worker's final counts; its pool is left out once the process exits
+            write_snapshot(None)
+        await disconnect_db()
+        shutdown_executor()
+        shutdown_image_executor()
+
+app = FastAPI(lifespan=lifespan)
+
+# The middleware added last runs first: metrics see every response, including shed ones,
+# and admission control turns excess load away before any other work is done
 
-# Event handler for application shutdown
-@app.on_event("shutdown")
-async def shutdown_event():
-    await disconnect_db()
+# Clients that just wrote read from the primary for a few seconds (no-op without replicas)
+app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+
+# Fast 503 + Retry-After when this worker is overloaded or draining
+app.add_middleware(AdmissionMiddleware, control=admission)
+
+# Per-route latency histograms and status counts, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Include router for Users
 app.include_router(users.router, prefix="/api")
@@ -22,4 +107,16 @@ app.include_router(admin.router, prefix="/api")
 
 app.include_router(products.router, prefix="/api")
 
-app.include_router(cart.router, prefix="/api")
\ No newline at end of file
+app.include_router(cart.router, prefix="/api")
+
+app.include_router(orders.router, prefix="/api")
+
+app.include_router(tokens.router, prefix="/api")
+
+app.include_router(monitoring.router, prefix="/api")
+
+app.include_router(monitoring.metrics_router)
+
+# Uploaded product images and their variants, served with immutable cache headers
+os.makedirs(IMAGE_ROOT, exist_ok=True)
+app.mount("/static/images", ImmutableStaticFiles(directory=IMAGE_ROOT), name="images")
@@ -0,0 +1,172 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from functools import partial
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from background import BackgroundTask, run_every
+from database import get_revoked_tokens, purge_revoked_tokens, revoke_token
+from notifications import notify
+
+# Shared signing key. Every worker (and every restart) must use the same value, or
+# tokens issued by one process are rejected by another, so there is no random fallback.
+# AUTH_DEV_MODE=1 allows a fixed, publicly known key for local development only.
+AUTH_DEV_MODE = os.getenv("AUTH_DEV_MODE", "0") == "1"
+DEV_AUTH_SECRET = b"pgro-development-key-not-for-production"
+
+AUTH_SECRET = os.getenv("AUTH_SECRET", "").encode()
+if not AUTH_SECRET:
+    if not AUTH_DEV_MODE:
+        raise RuntimeError("AUTH_SECRET is not set (set AUTH_DEV_MODE=1 to use an insecure development key)")
+    AUTH_SECRET = DEV_AUTH_SECRET
+    print("AUTH_SECRET is not set; using the insecure development key")
+
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(14 * 24 * 3600)))
+REVOCATION_REFRESH_INTERVAL = float(os.getenv("REVOCATION_REFRESH_INTERVAL", "60"))
+
+# Channel that tells every worker an access token was revoked
+REVOCATION_CHANNEL = "token_revoked"
+
+TOKEN_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+# Signed token (JWT, HS256) carrying who the caller is; verifying it needs no DB
+def create_token(subject: int, role: str, kind: str, ttl: int):
+    now = int(time.time())
+    claims = {"sub": str(subject), "role": role, "typ": kind, "iat": now, "exp": now + ttl, "jti": secrets.token_hex(16)}
+    signing_input = TOKEN_HEADER + b"." + b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signature = hmac.new(AUTH_SECRET, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + b64encode(signature)).decode(), claims
+
+
+# Check signature, expiry and kind; returns the claims or None
+def decode_token(token: str, kind: str):
+    try:
+        signing_input, _, signature = token.encode().rpartition(b".")
+        expected = hmac.new(AUTH_SECRET, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64decode(signature)):
+            return None
+        claims = json.loads(b64decode(signing_input.split(b".", 1)[1]))
+    except (ValueError, IndexError):
+        return None
+    if claims.get("typ") != kind or claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+# Access plus refresh token pair for a login or a refresh
+def issue_tokens(subject: int, role: str):
+    access_token, _ = create_token(subject, role, "access", ACCESS_TOKEN_TTL)
+    refresh_token, _ = create_token(subject, role, "refresh", REFRESH_TOKEN_TTL)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
+
+
+# In-memory copy of revoked, not yet expired access token ids. Reloaded from Postgres in the
+# background and updated instantly over NOTIFY, so checking a request never queries.
+class RevocationList:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._revoked = {}
+        self._task = BackgroundTask(partial(run_every, interval, self.reload, "Revocation list reload"))
+
+    def is_revoked(self, jti: str):
+        return jti in self._revoked
+
+    def add(self, jti: str, expires_at: float):
+        self._revoked[jti] = expires_at
+
+    # Listener callback; payload is "<jti> <expires_at>"
+    def on_notify(self, payload: str):
+        jti, _, expires_at = payload.partition(" ")
+        self.add(jti, float(expires_at or 0))
+
+    async def reload(self):
+        await purge_revoked_tokens()
+        rows = await get_revoked_tokens("access")
+        self._revoked = {row["jti"]: row["expires_at"].timestamp() for row in rows}
+
+    def on_reconnect(self):
+        if self._task.running:
+            asyncio.create_task(self.reload())
+
+    async def start(self):
+        await self.reload()
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+revocation_list = RevocationList(REVOCATION_REFRESH_INTERVAL)
+
+
+# Revoke a token; returns False if it was already revoked (a replayed refresh token).
+# Access token revocations are pushed to every worker's in-memory list.
+async def revoke(claims: dict):
+    if await revoke_token(claims["jti"], claims["typ"], claims["exp"]) is None:
+        return False
+    if claims["typ"] == "access":
+        revocation_list.add(claims["jti"], claims["exp"])
+        await notify(REVOCATION_CHANNEL, f"{claims['jti']} {claims['exp']}")
+    return True
+
+
+# Who is calling, as read from a verified access token
+class Principal:
+    __slots__ = ("subject", "role", "claims")
+
+    def __init__(self, claims: dict):
+        self.subject = int(claims["sub"])
+        self.role = claims["role"]
+        self.claims = claims
+
+
+bearer = HTTPBearer(auto_error=False)
+
+
+# Dependency: the caller's verified access token
+async def current_principal(credentials: HTTPAuthorizationCredentials | None = Depends(bearer)):
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    claims = decode_token(credentials.credentials, "access")
+    if claims is None or revocation_list.is_revoked(claims["jti"]):
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    return Principal(claims)
+
+
+# Dependency: only admins
+async def require_admin(principal: Principal = Depends(current_principal)):
+    if principal.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return principal
+
+
+# Dependency: the user named by the {user_id} path parameter, or an admin
+async def require_user(user_id: int, principal: Principal = Depends(current_principal)):
+    check_owner(principal, user_id)
+    return principal
+
+
+# Raise unless the principal owns `user_id` or is an admin
+def check_owner(principal: Principal, user_id: int):
+    if principal.role != "admin" and (principal.role != "user" or principal.subject != user_id):
+        raise HTTPException(status_code=403, detail="Not allowed")
@@ -0,0 +1,39 @@
+import asyncio
+
+
+# One long-running asyncio task owned by a component: start() launches it once,
+# stop() cancels it and waits for it to finish
+class BackgroundTask:
+    def __init__(self, run):
+        # Zero-argument callable returning the coroutine to run
+        self._run = run
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Await job() every `interval` seconds forever, logging failures instead of stopping
+async def run_every(interval: float, job, description: str, immediately: bool = False):
+    if not immediately:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await job()
+        except Exception as exc:
+            print(f"{description} failed: {exc}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Throughput and latency summary for one scenario, in milliseconds
+def summarize(name, latencies, statuses, elapsed, **extra):
+    latencies = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 400)
+    return {
+        "scenario": name,
+        **extra,
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            key: None if not latencies else round(percentile(latencies, fraction) * 1000, 3)
+            for key, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+# Drive `make_request(http)` from `concurrency` clients until `total` requests are done
+async def drive(http, make_request, concurrency, total):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total))
+
+    async def client():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await make_request(http)
+                status = response.status_code
+            except Exception:
+                status = 599
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
@@ -0,0 +1,56 @@
+"""Do login bursts stall the catalog? Measures catalog latency alone, then during a burst.
+
+Each login runs a slow password KDF. With hashing on the worker pool the event loop
+stays free, so /api/products latency during the burst should stay near the baseline.
+Needs a server and users seeded by bench/seed.py.
+
+    python bench/login_burst.py --url http://localhost:8000 --users 1000 \
+        --login-concurrency 64 --logins 2000 --catalog-concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import httpx
+from common import drive, summarize
+from seed import user_credentials
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.login_concurrency + args.catalog_concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as http:
+        def catalog(http):
+            return http.get("/api/products", params={"limit": 20})
+
+        counter = iter(range(args.logins))
+
+        def login(http):
+            _, email, password = user_credentials(next(counter, 0) % args.users)
+            return http.post("/api/users/login", json={"email": email, "password_hash": password})
+
+        await drive(http, catalog, args.catalog_concurrency, args.catalog_requests)
+        baseline = summarize("catalog_baseline", *await drive(http, catalog, args.catalog_concurrency, args.catalog_requests))
+
+        login_task = asyncio.create_task(drive(http, login, args.login_concurrency, args.logins))
+        during = summarize("catalog_during_logins", *await drive(http, catalog, args.catalog_concurrency, args.catalog_requests))
+        logins = summarize("login_burst", *await login_task, concurrency=args.login_concurrency)
+
+    return {
+        "results": [baseline, during, logins],
+        "catalog_p99_ratio": during["latency_ms"]["p99"] / baseline["latency_ms"]["p99"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=1000, help="users seeded by bench/seed.py")
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--catalog-requests", type=int, default=2000)
+    parser.add_argument("--catalog-concurrency", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-row cost of serializing a product listing, before and after the orjson path.
+
+"before" is the original route: copy each record into a dict by hand, then let
+FastAPI run jsonable_encoder and json.dumps. "after" builds slot dataclasses
+straight from the records and encodes them with orjson. No database is needed;
+rows are synthetic stand-ins for `databases` records.
+
+    python bench/serialization.py --rows 10000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from product import Product, from_record
+from responses import dumps
+
+
+# Minimal stand-in for a `databases` record: exposes the row through `_mapping`
+class FakeRecord:
+    __slots__ = ("_mapping",)
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def __getitem__(self, key):
+        return self._mapping[key]
+
+
+def make_rows(count: int):
+    return [
+        FakeRecord({
+            "id": index,
+            "name": f"classic cotton shirt {index}",
+            "price": Decimal("199.50"),
+            "quantity": index % 500,
+            "description": "soft cotton shirt with a classic fit " * 4,
+            "image_url": f"https://example.com/images/{index}.jpg",
+            "image_key": None,
+        })
+        for index in range(count)
+    ]
+
+
+def before(rows):
+    products = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "price": row["price"],
+            "quantity": row["quantity"],
+            "description": row["description"],
+            "image_url": row["image_url"],
+            "image_key": row["image_key"],
+        }
+        for row in rows
+    ]
+    return json.dumps(jsonable_encoder(products), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(rows):
+    return dumps([from_record(Product, row) for row in rows])
+
+
+def measure(function, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(rows)
+        best = min(best, time.perf_counter() - started)
+    return {"best_s": best, "per_row_us": best / len(rows) * 1e6, "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rows = make_rows(args.rows)
+    results = {"rows": args.rows, "before": measure(before, rows, args.repeat), "after": measure(after, rows, args.repeat)}
+    results["speedup"] = results["before"]["best_s"] / results["after"]["best_s"]
+    results["generated_at"] = datetime.now().isoformat(timespec="seconds")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+import orjson
+from fastapi import Request, Response
+from notifications import notify
+from responses import dumps
+
+# Channel used to tell every worker that the catalog changed
+CATALOG_CHANNEL = "catalog_invalidate"
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+# Lifetime of listing and search pages that show stock. Stock changes only evict the
+# changed products' own entries, so this bounds how stale a page's quantities can be.
+STOCK_CACHE_TTL = float(os.getenv("STOCK_CACHE_TTL", "2"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+
+
+# A cached, already-encoded JSON response
+class CacheEntry:
+    __slots__ = ("body", "etag", "headers", "expires_at")
+
+    def __init__(self, body: bytes, headers: dict, expires_at: float):
+        self.body = body
+        # Content hash, so every worker produces the same ETag for the same body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.expires_at = expires_at
+
+
+# Size-bounded LRU cache with a TTL. Catalog writes bump the version and drop every entry;
+# stock changes drop the changed products' entries and pages showing stock expire quickly.
+class CatalogCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = uuid.uuid4().hex
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    # Store content read while the cache was at `version`; a read that raced an
+    # invalidation is still returned to its caller but is not kept
+    def set(self, key: str, content, headers: dict | None = None, version: str | None = None, ttl: float | None = None):
+        body = dumps(content)
+        entry = CacheEntry(body, headers or {}, time.monotonic() + (self.ttl if ttl is None else ttl))
+        if version is not None and version != self.version:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    # Drop everything and move to a new version; returns the version now in effect
+    def invalidate(self, version: str | None = None):
+        self._entries.clear()
+        self.version = version or uuid.uuid4().hex
+        return self.version
+
+    # Drop some entries and move to a new version, so a read already in flight for one of
+    # them is not kept either
+    def evict(self, keys):
+        for key in keys:
+            self._entries.pop(key, None)
+        self.version = uuid.uuid4().hex
+
+    # Listener callback for events.PRODUCT_CHANNEL: drop the changed products' own entries.
+    # Stock batches arrive several times a second under checkout load, so they leave the
+    # listing and search pages to STOCK_CACHE_TTL; any other change drops those pages too.
+    def on_product_change(self, payload: str):
+        message = orjson.loads(payload)
+        if message["op"] == "resync":
+            self.invalidate()
+            return
+        keys = {f"product:{change['id']}" for change in message["changes"]}
+        if any(change["op"] != "stock" for change in message["changes"]):
+            keys.update(key for key in self._entries if not key.startswith("product:"))
+        self.evict(keys)
+
+    # Listener callback: another worker (or this one) changed the catalog
+    def on_notify(self, version: str):
+        if version != self.version:
+            self.invalidate(version)
+
+    # Listener reconnect callback: notifications may have been missed while disconnected
+    def on_reconnect(self):
+        self.invalidate()
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+
+
+# Invalidate this worker's cache and signal the other workers
+async def invalidate_catalog():
+    version = catalog_cache.invalidate()
+    await notify(CATALOG_CHANNEL, version)
+
+
+def etag_matches(if_none_match: str, etag: str):
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+# Build the HTTP response for a cache entry, answering 304 when the client already has it
+def cached_response(request: Request, entry: CacheEntry):
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,43 @@
+"""Create an admin account from the command line.
+
+The API only lets an existing admin create admins, so the first one is made here:
+
+    python create_admin.py --username root --email root@example.com
+    ADMIN_PASSWORD=... python create_admin.py --username root --email root@example.com
+
+The password is read from ADMIN_PASSWORD, or prompted for when it is not set.
+"""
+import argparse
+import asyncio
+import getpass
+import os
+from asyncpg.exceptions import UniqueViolationError
+from database import database, insert_admin
+from passwords import hash_password_sync
+
+
+async def create_admin(username: str, email: str, password: str):
+    await database.connect()
+    try:
+        return await insert_admin(username, hash_password_sync(password), email)
+    finally:
+        await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--email", required=True)
+    args = parser.parse_args()
+    password = os.getenv("ADMIN_PASSWORD") or getpass.getpass("Password: ")
+    if not password:
+        parser.error("a password is required")
+    try:
+        admin = asyncio.run(create_admin(args.username, args.email, password))
+    except UniqueViolationError:
+        parser.exit(1, "An admin with that username or email already exists\n")
+    print(f"Created admin {admin['admin_id']} ({admin['adminusername']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,84 @@
-from databases import Database
+import os
+import random
+from metrics import TimedDatabase
+from pool import InstrumentedPool
+from replicas import ReplicaRouter
 
-# Database connection parameters
-POSTGRES_USER = "Yin"
-POSTGRES_PASSWORD = "66011050"
-POSTGRES_DB = "PGRO"
-POSTGRES_HOST = "db"
+# Database connection parameters (DATABASE_URL, when set, overrides them all)
+POSTGRES_USER = os.getenv("POSTGRES_USER", "Yin")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "66011050")
+POSTGRES_DB = os.getenv("POSTGRES_DB", "PGRO")
+POSTGRES_HOST = os.getenv("POSTGRES_HOST", "db")
 
-DATABASE_URL = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}'
+DATABASE_URL = os.getenv("DATABASE_URL") or f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}'
+DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# Create a Database instance
-database = Database(DATABASE_URL)
+# Plain DSN for code that talks to asyncpg directly (LISTEN, migrations)
+ASYNCPG_DSN = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+# Connection pool settings, per worker process. Passed straight to asyncpg.create_pool.
+DB_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "5")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    # Recycle a connection after this many queries, and close ones idle for this many seconds
+    "max_queries": int(os.getenv("DB_POOL_MAX_QUERIES", "50000")),
+    "max_inactive_connection_lifetime": float(os.getenv("DB_POOL_MAX_IDLE_LIFETIME", "300")),
+    # Prepared statements cached per connection; set 0 behind pgbouncer in transaction mode
+    "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024")),
+    "timeout": float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+    "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+}
+
+# Seconds a bulk import may spend in COPY and in each merge statement. Separate from
+# DB_COMMAND_TIMEOUT because COPY lasts as long as the upload, which can be minutes.
+DB_COPY_TIMEOUT = float(os.getenv("DB_COPY_TIMEOUT", "900"))
+
+# Seconds a request may wait for a free pooled connection
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "5"))
+
+# Optional read replicas, comma separated. Read-only helpers use `replica_router`, which
+# falls back to the primary when no replica is configured or healthy.
+DATABASE_REPLICA_URLS = [
+    url.strip().replace("postgresql://", "postgresql+asyncpg://", 1)
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+# A replica further behind than this many seconds stops receiving reads
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+# After a write, that client's reads go to the primary for this many seconds
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# Create a Database instance; every call is timed per helper for /metrics
+database = TimedDatabase(DATABASE_URL, **DB_POOL_OPTIONS)
+
+replica_router = ReplicaRouter(
+    database,
+    [TimedDatabase(url, **DB_POOL_OPTIONS) for url in DATABASE_REPLICA_URLS],
+    max_lag=REPLICA_MAX_LAG,
+    check_interval=REPLICA_CHECK_INTERVAL,
+    pin_window=REPLICA_PIN_SECONDS,
+)
 
 # Connect to the database
 async def connect_db():
     await database.connect()
+    # `databases` keeps its asyncpg pool on the backend; wrap it to measure acquires
+    database._backend._pool = InstrumentedPool(database._backend._pool, DB_ACQUIRE_TIMEOUT)
     print("Database connected")
 
+# Pool statistics, or None before connect
+def get_pool_stats():
+    pool = database._backend._pool
+    if not isinstance(pool, InstrumentedPool):
+        return None
+    return pool.stats()
+
+# Requests currently waiting for a pooled connection; cheap enough to call per request
+def get_pool_waiting():
+    pool = database._backend._pool
+    return pool.waiting if isinstance(pool, InstrumentedPool) else 0
+
 # Disconnect from the database
 async def disconnect_db():
     await database.disconnect()
@@ -35,12 +98,17 @@ async def insert_user(username: str, password_hash: str, email: str):
 # Get user by username
 async def get_user(username: str):
     query = "SELECT * FROM users WHERE username = :username"
-    return await database.fetch_one(query=query, values={"username": username})
+    return await replica_router.fetch_one(query=query, values={"username": username})
+
+# Get user by email; the password is checked by the caller against the stored hash
+async def get_user_by_email(email: str):
+    query = "SELECT * FROM users WHERE email = :email"
+    return await database.fetch_one(query=query, values={"email": email})
 
-# Get user by email and password hash
-async def get_user_by_email(email: str, password_hash: str):
-    query = "SELECT * FROM users WHERE email = :email AND password_hash = :password_hash"
-    return await database.fetch_one(query=query, values={"email": email, "password_hash": password_hash})
+# Replace a user's stored password hash
+async def update_user_password(user_id: int, password_hash: str):
+    query = "UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id"
+    return await database.execute(query=query, values={"user_id": user_id, "password_hash": password_hash})
 
 # Update user
 async def update_user(user_id: int, username: str, password_hash: str, email: str):
@@ -74,11 +142,6 @@ async def get_admin(adminusername: str):
     query = "SELECT * FROM admins WHERE adminusername = :adminusername"
     return await database.fetch_one(query=query, values={"adminusername": adminusername})
 
-# Get admin by email and password
-async def get_admin_by_email(adminemail: str, adminpassword: str):
-    query = "SELECT * FROM admins WHERE adminemail = :adminemail AND adminpassword = :adminpassword"
-    return await database.fetch_one(query=query, values={"adminemail": adminemail, "adminpassword": adminpassword})
-
 # Update admin
 async def update_admin(admin_id: int, adminusername: str, adminpassword: str, adminemail: str):
     query = """
@@ -96,21 +159,70 @@ async def delete_admin(admin_id: int):
     return await database.fetch_one(query=query, values={"admin_id": admin_id})
 
 # -------- Product Functions -------- #
-# Get all products
-async def get_products():
-    query = "SELECT * FROM products"
-    rows = await database.fetch_all(query=query)
-    return [
-        {
-            "id": row["id"],
-            "name": row["name"],
-            "price": row["price"],
-            "quantity": row["quantity"],
-            "description": row["description"],
-            "image_url": row["image_url"]
-        }
-        for row in rows
-    ]
+# Columns a caller may ask for when listing products
+PRODUCT_COLUMNS = ("id", "name", "price", "quantity", "description", "image_url", "image_key")
+
+# Get one page of products, ordered by id (keyset pagination)
+async def get_products(limit: int = 100, after_id: int | None = None, fields: tuple[str, ...] = PRODUCT_COLUMNS):
+    # Column names cannot be bound as parameters, so only whitelisted names are interpolated
+    columns = ", ".join(field for field in fields if field in PRODUCT_COLUMNS)
+    if after_id is None:
+        query = f"SELECT {columns} FROM products ORDER BY id LIMIT :limit"
+        values = {"limit": limit}
+    else:
+        query = f"SELECT {columns} FROM products WHERE id > :after_id ORDER BY id LIMIT :limit"
+        values = {"limit": limit, "after_id": after_id}
+    return await replica_router.fetch_all(query=query, values=values)
+
+# Ranked product search. Full-text matches use the search_vector GIN index and
+# fuzzy matches the pg_trgm indexes on name and description, so nothing is a scan.
+async def search_products(text: str, tsquery: str, limit: int, offset: int):
+    query = """
+    SELECT id, name, price, quantity, description, image_url, image_key,
+           ts_rank_cd(search_vector, query) + similarity(name, :text) AS rank
+    FROM products, to_tsquery('simple', :tsquery) AS query
+    WHERE search_vector @@ query OR name % :text OR :text <% description
+    ORDER BY rank DESC, id
+    LIMIT :limit OFFSET :offset
+    """
+    values = {"text": text, "tsquery": tsquery, "limit": limit, "offset": offset}
+    return await replica_router.fetch_all(query=query, values=values)
+
+# Ids probed per candidate wanted, to cover deleted ids and sold-out products
+RECOMMENDATION_OVERSAMPLE = 4
+# Probe rounds before settling for a smaller pool (e.g. when most of the catalog is sold out)
+RECOMMENDATION_PROBE_ROUNDS = 3
+
+# Get a random sample of in-stock products to recommend from. Random ids between the
+# smallest and largest id are looked up through the primary key, so every product is
+# equally likely and each call reads a few thousand index entries, never the whole table.
+async def get_recommendation_candidates(limit: int):
+    bounds = await replica_router.fetch_one("SELECT min(id) AS low, max(id) AS high FROM products")
+    if bounds is None or bounds["low"] is None:
+        return []
+    ids = range(bounds["low"], bounds["high"] + 1)
+    query = """
+    SELECT id, name, price, quantity, image_url, image_key
+    FROM products
+    WHERE id = ANY(CAST(:ids AS INTEGER[])) AND quantity > 0
+    """
+    rows, probed = [], set()
+    for _ in range(RECOMMENDATION_PROBE_ROUNDS):
+        unprobed = len(ids) - len(probed)
+        if len(rows) >= limit or not unprobed:
+            break
+        wanted = min(unprobed, (limit - len(rows)) * RECOMMENDATION_OVERSAMPLE)
+        if wanted == unprobed:
+            probe = [i for i in ids if i not in probed]
+        else:
+            probe = set()
+            while len(probe) < wanted:
+                probe.update(i for i in random.sample(ids, wanted - len(probe)) if i not in probed)
+            probe = list(probe)
+        probed.update(probe)
+        rows.extend(await replica_router.fetch_all(query=query, values={"ids": probe}))
+    random.shuffle(rows)
+    return rows[:limit]
 
 # Insert a new product
 async def insert_product(name: str, price: float, quantity: int, description: str, image_url: str):
@@ -130,7 +242,7 @@ async def insert_product(name: str, price: float, quantity: int, description: st
 
 # Delete a product
 async def delete_product(product_id: int):
-    query = "DELETE FROM products WHERE id = :product_id RETURNING *"
+    query = "DELETE FROM products WHERE id = :product_id RETURNING id, name, price, quantity, description, image_url"
     return await database.fetch_one(query=query, values={"product_id": product_id})
 
 # Update product
@@ -151,7 +263,298 @@ async def update_product(product_id: int, name: str, price: float, quantity: int
     }
     return await database.fetch_one(query=query, values=values)
 
+# Apply many partial product updates in one statement. A None in any list keeps that
+# column's current value. Returns the updated rows; ids that do not exist are absent.
+async def patch_products(ids: list[int], names: list, prices: list, quantities: list, descriptions: list, image_urls: list):
+    query = """
+    UPDATE products p
+    SET name = COALESCE(u.name, p.name),
+        price = COALESCE(u.price, p.price),
+        quantity = COALESCE(u.quantity, p.quantity),
+        description = COALESCE(u.description, p.description),
+        image_url = COALESCE(u.image_url, p.image_url)
+    FROM unnest(
+        CAST(:ids AS INTEGER[]),
+        CAST(:names AS TEXT[]),
+        CAST(:prices AS NUMERIC[]),
+        CAST(:quantities AS INTEGER[]),
+        CAST(:descriptions AS TEXT[]),
+        CAST(:image_urls AS TEXT[])
+    ) AS u (id, name, price, quantity, description, image_url)
+    WHERE p.id = u.id
+    RETURNING p.id, p.name, p.price, p.quantity, p.description, p.image_url
+    """
+    values = {
+        "ids": ids,
+        "names": names,
+        "prices": prices,
+        "quantities": quantities,
+        "descriptions": descriptions,
+        "image_urls": image_urls,
+    }
+    return await database.fetch_all(query=query, values=values)
+
+# Columns carried by bulk import/export files, in file order
+PRODUCT_TRANSFER_COLUMNS = ("id", "name", "price", "quantity", "description", "image_url")
+
+# Merge the staged rows into products: known ids are updated, everything else is inserted
+MERGE_IMPORT_QUERIES = (
+    """
+    WITH updated AS (
+        UPDATE products p
+        SET name = i.name, price = i.price, quantity = i.quantity, description = i.description, image_url = i.image_url
+        FROM products_import i
+        WHERE p.id = i.id
+        RETURNING p.id
+    )
+    SELECT count(*) FROM updated
+    """,
+    """
+    WITH inserted AS (
+        INSERT INTO products (name, price, quantity, description, image_url)
+        SELECT i.name, i.price, i.quantity, i.description, i.image_url
+        FROM products_import i
+        WHERE i.id IS NULL OR NOT EXISTS (SELECT 1 FROM products p WHERE p.id = i.id)
+        RETURNING id
+    )
+    SELECT count(*) FROM inserted
+    """,
+)
+
+# Bulk load products with COPY into a temporary staging table, then merge in one transaction.
+# Pass `csv_source` (an async iterable of CSV bytes without the header row, with `columns`
+# in file order; see transfer.read_csv_header) or `records` (an async iterable of tuples in
+# PRODUCT_TRANSFER_COLUMNS order). Raises asyncio.TimeoutError when a step takes longer
+# than `timeout` seconds.
+async def import_products(csv_source=None, records=None, columns=PRODUCT_TRANSFER_COLUMNS, timeout: float = DB_COPY_TIMEOUT):
+    async with database.connection() as connection:
+        async with connection.transaction():
+            raw = connection.raw_connection
+            await raw.execute("""
+                CREATE TEMP TABLE products_import (
+                    id INTEGER, name TEXT, price NUMERIC(12, 2), quantity INTEGER, description TEXT, image_url TEXT
+                ) ON COMMIT DROP
+            """)
+            if csv_source is not None:
+                await raw.copy_to_table(
+                    "products_import",
+                    source=csv_source,
+                    columns=columns,
+                    format="csv",
+                    timeout=timeout,
+                )
+            else:
+                await raw.copy_records_to_table(
+                    "products_import", records=records, columns=PRODUCT_TRANSFER_COLUMNS, timeout=timeout
+                )
+            updated = await raw.fetchval(MERGE_IMPORT_QUERIES[0], timeout=timeout)
+            inserted = await raw.fetchval(MERGE_IMPORT_QUERIES[1], timeout=timeout)
+    return {"updated": updated, "inserted": inserted}
+
+# Stream every product in id order through a server-side cursor, `prefetch` rows at a time
+async def iter_all_products(prefetch: int = 1000):
+    columns = ", ".join(PRODUCT_TRANSFER_COLUMNS)
+    async with database.connection() as connection:
+        async with connection.transaction():
+            raw = connection.raw_connection
+            async for record in raw.cursor(f"SELECT {columns} FROM products ORDER BY id", prefetch=prefetch):
+                yield record
+
 # Get product by ID
 async def get_product_by_id(product_id: int):
-    query = "SELECT * FROM products WHERE id = :product_id"
-    return await database.fetch_one(query=query, values={"product_id": product_id})
\ No newline at end of file
+    query = "SELECT id, name, price, quantity, description, image_url, image_key FROM products WHERE id = :product_id"
+    return await replica_router.fetch_one(query=query, values={"product_id": product_id})
+
+# Point a product at an uploaded image; image_url is set to a variant for older clients
+async def set_product_image(product_id: int, image_key: str, image_url: str):
+    query = """
+    UPDATE products SET image_key = :image_key, image_url = :image_url
+    WHERE id = :product_id
+    RETURNING id
+    """
+    values = {"product_id": product_id, "image_key": image_key, "image_url": image_url}
+    return await database.fetch_val(query=query, values=values)
+
+# Current stock of some products (for stock change events); always read from the primary
+async def get_product_stock(product_ids: list[int]):
+    query = "SELECT id, quantity FROM products WHERE id = ANY(CAST(:product_ids AS INTEGER[])) ORDER BY id"
+    return await database.fetch_all(query=query, values={"product_ids": product_ids})
+
+# -------- Cart Functions -------- #
+# Get a user's cart with product details in one query (served by the cart_items primary key)
+async def get_cart_items(user_id: int):
+    query = """
+    SELECT p.id, p.name, p.price, p.image_url, c.quantity, c.added_at
+    FROM cart_items c
+    JOIN products p ON p.id = c.product_id
+    WHERE c.user_id = :user_id
+    ORDER BY c.added_at, p.id
+    """
+    return await database.fetch_all(query=query, values={"user_id": user_id})
+
+# Add quantities to several cart lines in one statement, creating lines that do not exist
+async def add_cart_items(user_id: int, product_ids: list[int], quantities: list[int]):
+    query = """
+    INSERT INTO cart_items (user_id, product_id, quantity)
+    SELECT CAST(:user_id AS INTEGER), item.product_id, item.quantity
+    FROM unnest(CAST(:product_ids AS INTEGER[]), CAST(:quantities AS INTEGER[])) AS item (product_id, quantity)
+    ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = cart_items.quantity + EXCLUDED.quantity
+    RETURNING product_id, quantity
+    """
+    values = {"user_id": user_id, "product_ids": product_ids, "quantities": quantities}
+    return await database.fetch_all(query=query, values=values)
+
+# Set the quantity of one cart line, creating it if needed
+async def set_cart_item(user_id: int, product_id: int, quantity: int):
+    query = """
+    INSERT INTO cart_items (user_id, product_id, quantity)
+    VALUES (:user_id, :product_id, :quantity)
+    ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = EXCLUDED.quantity
+    RETURNING product_id, quantity
+    """
+    values = {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+    return await database.fetch_one(query=query, values=values)
+
+# Remove one line from a cart
+async def delete_cart_item(user_id: int, product_id: int):
+    query = "DELETE FROM cart_items WHERE user_id = :user_id AND product_id = :product_id RETURNING product_id"
+    return await database.fetch_one(query=query, values={"user_id": user_id, "product_id": product_id})
+
+# Empty a cart
+async def clear_cart(user_id: int):
+    query = "DELETE FROM cart_items WHERE user_id = :user_id"
+    return await database.execute(query=query, values={"user_id": user_id})
+
+
+# -------- Order Functions -------- #
+# Reserve stock and create an order in one transaction.
+# Stock is taken with a conditional decrement, so concurrent buyers never oversell and
+# row locks are only held for the length of this transaction. Returns None when any
+# product is missing or short on stock.
+async def reserve_order(user_id: int, product_ids: list[int], quantities: list[int], hold_seconds: int):
+    reserve_query = """
+    UPDATE products p
+    SET quantity = p.quantity - item.quantity
+    FROM unnest(CAST(:product_ids AS INTEGER[]), CAST(:quantities AS INTEGER[])) AS item (product_id, quantity)
+    WHERE p.id = item.product_id AND p.quantity >= item.quantity
+    RETURNING p.id AS product_id, p.name, item.quantity, p.price
+    """
+    order_query = """
+    WITH new_order AS (
+        INSERT INTO orders (user_id, status, total, expires_at)
+        VALUES (:user_id, 'reserved', :total, now() + make_interval(secs => :hold_seconds))
+        RETURNING id, user_id, status, total, created_at, expires_at
+    ), new_items AS (
+        INSERT INTO order_items (order_id, product_id, product_name, quantity, unit_price)
+        SELECT new_order.id, item.product_id, item.product_name, item.quantity, item.unit_price
+        FROM new_order, unnest(
+            CAST(:product_ids AS INTEGER[]), CAST(:names AS TEXT[]), CAST(:quantities AS INTEGER[]), CAST(:unit_prices AS NUMERIC[])
+        ) AS item (product_id, product_name, quantity, unit_price)
+    )
+    SELECT * FROM new_order
+    """
+    transaction = await database.transaction()
+    try:
+        reserved = await database.fetch_all(query=reserve_query, values={"product_ids": product_ids, "quantities": quantities})
+        if len(reserved) != len(product_ids):
+            await transaction.rollback()
+            return None
+        values = {
+            "user_id": user_id,
+            "total": sum(row["price"] * row["quantity"] for row in reserved),
+            "hold_seconds": hold_seconds,
+            "product_ids": [row["product_id"] for row in reserved],
+            "names": [row["name"] for row in reserved],
+            "quantities": [row["quantity"] for row in reserved],
+            "unit_prices": [row["price"] for row in reserved],
+        }
+        order = await database.fetch_one(query=order_query, values=values)
+    except Exception:
+        await transaction.rollback()
+        raise
+    await transaction.commit()
+    return order
+
+# Get an order with its items
+async def get_order(order_id: int):
+    query = "SELECT * FROM orders WHERE id = :order_id"
+    return await database.fetch_one(query=query, values={"order_id": order_id})
+
+async def get_order_items(order_id: int):
+    query = "SELECT product_id, product_name, quantity, unit_price FROM order_items WHERE order_id = :order_id ORDER BY id"
+    return await database.fetch_all(query=query, values={"order_id": order_id})
+
+# Mark a reservation as paid, if it has not expired
+async def pay_order(order_id: int):
+    query = """
+    UPDATE orders SET status = 'paid'
+    WHERE id = :order_id AND status = 'reserved' AND expires_at > now()
+    RETURNING id, user_id, status, total, created_at, expires_at
+    """
+    return await database.fetch_one(query=query, values={"order_id": order_id})
+
+# Statement that closes reservations chosen by the `target` CTE and puts their stock back.
+# SKIP LOCKED lets several workers sweep at once without waiting on each other.
+RELEASE_QUERY = """
+WITH target AS ({target}), released AS (
+    UPDATE orders o SET status = :status
+    FROM target
+    WHERE o.id = target.id
+    RETURNING o.id
+), restock AS (
+    SELECT oi.product_id, SUM(oi.quantity) AS quantity
+    FROM order_items oi
+    JOIN released r ON r.id = oi.order_id
+    GROUP BY oi.product_id
+), restocked AS (
+    UPDATE products p SET quantity = p.quantity + restock.quantity
+    FROM restock
+    WHERE p.id = restock.product_id
+    RETURNING p.id
+)
+SELECT (SELECT count(*) FROM released) AS released, ARRAY(SELECT id FROM restocked) AS product_ids
+"""
+
+# Cancel one open reservation and release its stock.
+# Returns the restocked product ids, or None when the order was not open.
+async def cancel_order(order_id: int):
+    target = "SELECT id FROM orders WHERE id = :order_id AND status = 'reserved' FOR UPDATE"
+    query = RELEASE_QUERY.format(target=target)
+    row = await database.fetch_one(query=query, values={"order_id": order_id, "status": "cancelled"})
+    return list(row["product_ids"]) if row["released"] else None
+
+# Expire up to `limit` overdue reservations and release their stock.
+# Returns how many were expired and the restocked product ids.
+async def release_expired_reservations(limit: int):
+    target = """
+    SELECT id FROM orders
+    WHERE status = 'reserved' AND expires_at <= now()
+    ORDER BY expires_at
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+    """
+    query = RELEASE_QUERY.format(target=target)
+    row = await database.fetch_one(query=query, values={"limit": limit, "status": "expired"})
+    return row["released"], list(row["product_ids"])
+
+
+# -------- Token Functions -------- #
+# Record a revoked token; returns None if it was already revoked
+async def revoke_token(jti: str, kind: str, expires_at: int):
+    query = """
+    INSERT INTO revoked_tokens (jti, kind, expires_at)
+    VALUES (:jti, :kind, to_timestamp(:expires_at))
+    ON CONFLICT (jti) DO NOTHING
+    RETURNING jti
+    """
+    return await database.fetch_one(query=query, values={"jti": jti, "kind": kind, "expires_at": expires_at})
+
+# Get revoked tokens of one kind that have not expired yet
+async def get_revoked_tokens(kind: str):
+    query = "SELECT jti, expires_at FROM revoked_tokens WHERE kind = :kind AND expires_at > now()"
+    return await database.fetch_all(query=query, values={"kind": kind})
+
+# Forget revocations of tokens that have expired anyway
+async def purge_revoked_tokens():
+    query = "DELETE FROM revoked_tokens WHERE expires_at <= now()"
+    return await database.execute(query=query)
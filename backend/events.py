@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import os
+import orjson
+from functools import partial
+from background import BackgroundTask, run_every
+from database import get_product_stock
+from notifications import notify
+
+# Channel product changes are announced on, as {"op": "batch", "changes": [...]} or
+# {"op": "resync"}. The products trigger (migration 0009) sends catalog edits; stock-only
+# changes are sent by StockEvents below.
+PRODUCT_CHANNEL = "product_changes"
+RESYNC_PAYLOAD = '{"op":"resync"}'
+
+# How often a worker announces the stock levels that changed since the last time
+STOCK_EVENT_INTERVAL = float(os.getenv("STOCK_EVENT_INTERVAL", "0.5"))
+# Keep each NOTIFY payload well under Postgres's 8000 byte limit
+STOCK_EVENT_BATCH = 150
+
+# Events buffered per client before it is considered too slow and disconnected
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "10000"))
+# Comment lines sent on idle streams so proxies do not time them out
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
+HEARTBEAT = b": ping\n\n"
+
+
+# Fans product change notifications out to this worker's Server-Sent Events clients.
+# Each event is encoded once and the same bytes are queued for every client, so one
+# LISTEN connection per worker serves any number of streams.
+class ProductEventHub:
+    def __init__(self, queue_size: int, max_clients: int, heartbeat: float):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.heartbeat = heartbeat
+        self._queues = set()
+        self._ids = itertools.count(1)
+
+    @property
+    def clients(self):
+        return len(self._queues)
+
+    def full(self):
+        return len(self._queues) >= self.max_clients
+
+    def publish(self, event: str, data: str):
+        frame = f"id: {next(self._ids)}\nevent: {event}\ndata: {data}\n\n".encode()
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # The client cannot keep up; end its stream. EventSource reconnects and resyncs.
+                self._end(queue)
+
+    # Listener callback; a batch is forwarded as is, already JSON
+    def on_notify(self, payload: str):
+        if orjson.loads(payload)["op"] == "resync":
+            self.publish("resync", "{}")
+        else:
+            self.publish("product", payload)
+
+    # Listener reconnect callback: events may have been missed, clients must refetch
+    def on_reconnect(self):
+        self.publish("resync", "{}")
+
+    def _end(self, queue: asyncio.Queue):
+        self._queues.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    # End every stream, e.g. on shutdown so connections do not hold the server open
+    def close(self):
+        for queue in list(self._queues):
+            self._end(queue)
+
+    # Body of one SSE response. Event ids are per worker, so a client that reconnects with
+    # Last-Event-ID (possibly to another worker) is told to resync instead of replaying.
+    async def stream(self, resync: bool = False):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.add(queue)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            if resync:
+                yield b"event: resync\ndata: {}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self._queues.discard(queue)
+
+
+product_events = ProductEventHub(SSE_QUEUE_SIZE, SSE_MAX_CLIENTS, SSE_HEARTBEAT_INTERVAL)
+
+
+# Announces stock changes in batches. Checkout, cancellation and reservation expiry only
+# record which products they touched; every interval the current quantities of those
+# products are read and sent in one NOTIFY, outside any checkout transaction.
+class StockEvents:
+    def __init__(self, interval: float, batch: int):
+        self.interval = interval
+        self.batch = batch
+        self._pending = set()
+        self._task = BackgroundTask(partial(run_every, interval, self.flush, "Stock event flush"))
+
+    def record(self, product_ids):
+        self._pending.update(product_ids)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        product_ids, self._pending = sorted(self._pending), set()
+        rows = await get_product_stock(product_ids)
+        changes = [{"op": "stock", "id": row["id"], "quantity": row["quantity"]} for row in rows]
+        for start in range(0, len(changes), self.batch):
+            payload = orjson.dumps({"op": "batch", "changes": changes[start:start + self.batch]})
+            await notify(PRODUCT_CHANNEL, payload.decode())
+
+    async def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+        await self.flush()
+
+
+stock_events = StockEvents(STOCK_EVENT_INTERVAL, STOCK_EVENT_BATCH)
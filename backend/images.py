@@ -0,0 +1,207 @@
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from fastapi.staticfiles import StaticFiles
+
+# Uploaded product images live on disk under IMAGE_ROOT/<key>/, where <key> is a hash of
+# the original bytes. A path never changes content, so it can be cached forever.
+IMAGE_ROOT = os.getenv("IMAGE_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media", "images"))
+# Public prefix for variant URLs; point it at a CDN that fronts /static/images if there is one
+IMAGE_URL_PREFIX = os.getenv("IMAGE_URL_PREFIX", "/static/images").rstrip("/")
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Variant name -> longest edge in pixels. Cards use "card"; "large" is the detail page.
+IMAGE_VARIANTS = {"thumb": 160, "card": 400, "large": 1200}
+IMAGE_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Variant generation that has not finished this many seconds after the upload is assumed
+# lost (e.g. the worker restarted) and is started again from the stored original
+IMAGE_PROCESSING_TIMEOUT = float(os.getenv("IMAGE_PROCESSING_TIMEOUT", "120"))
+# Written next to the original when variant generation fails; holds the error
+IMAGE_FAILED_MARKER = "failed"
+IMAGE_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_executor = None
+_tasks = set()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def image_key(data: bytes):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+# Public URLs of every variant of an uploaded image, e.g. images["card"]["webp"]
+def image_variant_urls(key: str | None):
+    if key is None:
+        return None
+    return {
+        variant: {ext: f"{IMAGE_URL_PREFIX}/{key}/{variant}.{ext}" for ext in IMAGE_FORMATS}
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _variant_paths(directory: str):
+    return [os.path.join(directory, f"{variant}.{ext}") for variant in IMAGE_VARIANTS for ext in IMAGE_FORMATS]
+
+
+# Write the uploaded bytes as IMAGE_ROOT/<key>/original.<format> before answering the upload,
+# so variants can always be (re)generated from disk
+def store_original_sync(data: bytes, key: str, image_format: str, root: str = IMAGE_ROOT):
+    directory = os.path.join(root, key)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"original.{image_format.lower()}")
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    # A fresh upload of an image that failed before gets another attempt
+    try:
+        os.remove(os.path.join(directory, IMAGE_FAILED_MARKER))
+    except FileNotFoundError:
+        pass
+    return path
+
+
+def mark_image_failed_sync(key: str, error: str, root: str = IMAGE_ROOT):
+    _write_atomic(os.path.join(root, key, IMAGE_FAILED_MARKER), error.encode("utf-8"))
+
+
+# Bytes of a stored original, or None, for processing it again. Restarts its processing
+# clock, so other polls do not start it a second time.
+def reclaim_original_sync(key: str, root: str = IMAGE_ROOT):
+    for path in glob.glob(os.path.join(root, key, "original.*")):
+        os.utime(path)
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+# Progress of an upload from what is on disk: ("ready" | "processing" | "stalled" |
+# "failed" | "missing", error). "stalled" is processing that outlived IMAGE_PROCESSING_TIMEOUT.
+def image_status_sync(key: str, root: str = IMAGE_ROOT):
+    directory = os.path.join(root, key)
+    originals = glob.glob(os.path.join(directory, "original.*"))
+    if not originals:
+        return "missing", None
+    if all(os.path.exists(path) for path in _variant_paths(directory)):
+        return "ready", None
+    marker = os.path.join(directory, IMAGE_FAILED_MARKER)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            return "failed", f.read()
+    if time.time() - os.path.getmtime(originals[0]) > IMAGE_PROCESSING_TIMEOUT:
+        return "stalled", None
+    return "processing", None
+
+
+# Blocking helpers; these run inside the process pool
+
+# Check the upload is an image we can decode without decoding all of it; returns its format
+def probe_image_sync(data: bytes):
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as image:
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Image is too large ({width}x{height})")
+        image.verify()
+        return image.format
+
+
+# Store the original and write every variant. Files are replaced atomically and an image
+# that was already processed is skipped, so concurrent or repeated uploads are harmless.
+def generate_variants_sync(data: bytes, key: str, root: str = IMAGE_ROOT):
+    from PIL import Image, ImageOps
+
+    directory = os.path.join(root, key)
+    if all(os.path.exists(path) for path in _variant_paths(directory)):
+        return key
+    os.makedirs(directory, exist_ok=True)
+    with Image.open(BytesIO(data)) as source:
+        _write_atomic(os.path.join(directory, f"original.{source.format.lower()}"), data)
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ("RGBA", "LA") or "transparency" in source.info
+        source = source.convert("RGBA" if has_alpha else "RGB")
+        for variant, edge in IMAGE_VARIANTS.items():
+            resized = source.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            # JPEG has no alpha channel; flatten onto white
+            flat = resized
+            if has_alpha:
+                flat = Image.new("RGB", resized.size, "white")
+                flat.paste(resized, mask=resized.getchannel("A"))
+            for ext, (fmt, options) in IMAGE_FORMATS.items():
+                out = BytesIO()
+                (resized if fmt == "WEBP" else flat).save(out, fmt, **options)
+                _write_atomic(os.path.join(directory, f"{variant}.{ext}"), out.getvalue())
+    return key
+
+
+async def probe_image(data: bytes):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), probe_image_sync, data)
+
+
+# Small file operations; the default thread pool keeps them off the event loop
+async def store_original(data: bytes, key: str, image_format: str):
+    return await asyncio.get_running_loop().run_in_executor(None, store_original_sync, data, key, image_format)
+
+
+async def mark_image_failed(key: str, error: str):
+    return await asyncio.get_running_loop().run_in_executor(None, mark_image_failed_sync, key, error)
+
+
+async def reclaim_original(key: str):
+    return await asyncio.get_running_loop().run_in_executor(None, reclaim_original_sync, key)
+
+
+async def image_status(key: str):
+    return await asyncio.get_running_loop().run_in_executor(None, image_status_sync, key)
+
+
+async def generate_variants(data: bytes, key: str):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), generate_variants_sync, data, key)
+
+
+# Run a coroutine in the background, keeping a reference so it is not garbage collected
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+# Static files that are never revalidated: content-addressed paths change when content does
+class ImmutableStaticFiles(StaticFiles):
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
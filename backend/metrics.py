@@ -0,0 +1,297 @@
+import bisect
+import json
+import logging
+import os
+import sys
+import time
+from databases import Database
+
+# Queries slower than this many milliseconds are logged; 0 turns the log off
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+# Directory shared by the worker processes of one server (serve.py sets it). Each worker
+# writes its metrics there as <pid>.json and /metrics merges every file, so a scrape that
+# lands on any worker reports the whole server. Unset: a worker reports only itself.
+METRICS_DIR = os.getenv("METRICS_DIR")
+# How often each worker writes its file; a scrape sees other workers this far behind at most
+METRICS_WRITE_INTERVAL = float(os.getenv("METRICS_WRITE_INTERVAL", "5"))
+
+# Pool stats that are summed across workers
+POOL_GAUGES = ("size", "in_use", "idle", "waiting", "max_size")
+POOL_COUNTERS = ("acquired_total", "acquire_timeouts_total")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger("pgro.slow_query")
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    # JSON-friendly copy of the values, for write_snapshot
+    def snapshot(self):
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    # Add a snapshot into values (labels -> value)
+    @staticmethod
+    def merge(values: dict, snapshot: list):
+        for labels, value in snapshot:
+            labels = tuple(labels)
+            values[labels] = values.get(labels, 0) + value
+
+    def render(self, values: dict | None = None):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in (self._values if values is None else values).items():
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def snapshot(self):
+        return [[list(labels), series] for labels, series in self._values.items()]
+
+    @staticmethod
+    def merge(values: dict, snapshot: list):
+        for labels, (counts, total, count) in snapshot:
+            labels = tuple(labels)
+            series = values.get(labels)
+            if series is None:
+                values[labels] = [list(counts), total, count]
+                continue
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self, values: dict | None = None):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in (self._values if values is None else values).items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(self.labels + ("le",), labels + (bound,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_shed = Counter("http_requests_shed_total", "Requests rejected with 503 by admission control, by reason.", ("reason",))
+db_latency = Histogram("db_query_duration_seconds", "Database call latency by query name.", ("query",))
+db_rows = Counter("db_query_rows_total", "Rows returned by database calls, by query name.", ("query",))
+db_errors = Counter("db_query_errors_total", "Failed database calls by query name.", ("query",))
+
+METRICS = [http_requests, http_latency, http_shed, db_latency, db_rows, db_errors]
+
+
+# Per-route latency and status counts. A plain ASGI middleware, so streaming responses
+# pass through untouched; the route label is the path template, not the raw URL.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            http_latency.observe(labels, time.perf_counter() - started)
+            http_requests.inc(labels + (status,))
+
+
+def record_query(name: str, query, started: float, rows: int | None):
+    elapsed = time.perf_counter() - started
+    db_latency.observe((name,), elapsed)
+    if rows is None:
+        db_errors.inc((name,))
+    else:
+        db_rows.inc((name,), rows)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        text = " ".join(str(query).split())[:300]
+        slow_query_log.warning("slow query %s took %.1f ms: %s", name, elapsed * 1000, text)
+
+
+# Database that times every call. The query name defaults to the calling helper's
+# function name (get_products, insert_user, ...), so helpers need no changes.
+class TimedDatabase(Database):
+    async def fetch_all(self, query, values=None, name=None):
+        name = name or sys._getframe(1).f_code.co_name
+        started, rows = time.perf_counter(), None
+        try:
+            result = await super().fetch_all(query=query, values=values)
+            rows = len(result)
+            return result
+        finally:
+            record_query(name, query, started, rows)
+
+    async def fetch_one(self, query, values=None, name=None):
+        name = name or sys._getframe(1).f_code.co_name
+        started, rows = time.perf_counter(), None
+        try:
+            result = await super().fetch_one(query=query, values=values)
+            rows = 0 if result is None else 1
+            return result
+        finally:
+            record_query(name, query, started, rows)
+
+    async def fetch_val(self, query, values=None, column=0, name=None):
+        name = name or sys._getframe(1).f_code.co_name
+        started, rows = time.perf_counter(), None
+        try:
+            result = await super().fetch_val(query=query, values=values, column=column)
+            rows = 0 if result is None else 1
+            return result
+        finally:
+            record_query(name, query, started, rows)
+
+    async def execute(self, query, values=None, name=None):
+        name = name or sys._getframe(1).f_code.co_name
+        started, rows = time.perf_counter(), None
+        try:
+            result = await super().execute(query=query, values=values)
+            rows = 0
+            return result
+        finally:
+            record_query(name, query, started, rows)
+
+    async def execute_many(self, query, values, name=None):
+        name = name or sys._getframe(1).f_code.co_name
+        started, rows = time.perf_counter(), None
+        try:
+            result = await super().execute_many(query=query, values=values)
+            rows = 0
+            return result
+        finally:
+            record_query(name, query, started, rows)
+
+
+def _snapshot_path(pid: int):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def _alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Write this worker's metrics and pool stats to METRICS_DIR for the other workers to merge
+def write_snapshot(pool_stats: dict | None):
+    snapshot = {"pid": os.getpid(), "metrics": {metric.name: metric.snapshot() for metric in METRICS}, "pool": pool_stats}
+    path = _snapshot_path(os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+# Every worker's snapshot, including workers that have exited: their counts still happened
+def read_snapshots():
+    snapshots = []
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as exc:
+            print(f"Skipping metrics snapshot {entry.name}: {exc}")
+    return snapshots
+
+
+# Pool stats summed over the workers that are still running, with each worker's own stats
+def aggregate_pool_stats(snapshots: list):
+    workers = [
+        {"pid": snapshot["pid"], **snapshot["pool"]}
+        for snapshot in snapshots
+        if snapshot["pool"] is not None and _alive(snapshot["pid"])
+    ]
+    if not workers:
+        return None
+    totals = {key: sum(worker[key] for worker in workers) for key in POOL_GAUGES + POOL_COUNTERS}
+    return {**totals, "workers": sorted(workers, key=lambda worker: worker["pid"])}
+
+
+# Pool stats for the whole server when workers share METRICS_DIR, else for this worker
+def collect_pool_stats(pool_stats: dict | None):
+    if not METRICS_DIR:
+        return pool_stats
+    write_snapshot(pool_stats)
+    return aggregate_pool_stats(read_snapshots())
+
+
+# Prometheus text exposition of every metric, plus pool gauges when connected. With
+# METRICS_DIR set, the series are the sums over every worker of the server.
+def render_metrics(pool_stats: dict | None = None):
+    lines = []
+    if METRICS_DIR:
+        write_snapshot(pool_stats)
+        snapshots = read_snapshots()
+        for metric in METRICS:
+            values = {}
+            for snapshot in snapshots:
+                metric.merge(values, snapshot["metrics"].get(metric.name, []))
+            lines.extend(metric.render(values))
+        pool_stats = aggregate_pool_stats(snapshots)
+    else:
+        for metric in METRICS:
+            lines.extend(metric.render())
+    if pool_stats is not None:
+        for key in POOL_GAUGES:
+            name = f"db_pool_{key}"
+            lines.extend([f"# TYPE {name} gauge", f"{name} {pool_stats[key]}"])
+        for key in POOL_COUNTERS:
+            name = f"db_pool_{key}"
+            lines.extend([f"# TYPE {name} counter", f"{name} {pool_stats[key]}"])
+    return "\n".join(lines) + "\n"
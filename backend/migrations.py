@@ -0,0 +1,133 @@
+"""Versioned schema migrations.
+
+Each file in migrations/ is named <version>_<name>.sql and is applied once, in
+version order, and recorded in schema_migrations. A file whose first line is
+`-- migrate: no-transaction` runs statement by statement outside a transaction,
+which CREATE INDEX CONCURRENTLY requires; every other file runs in one transaction.
+
+Run from the app at startup, or by hand:
+
+    python migrations.py          # apply pending migrations
+    python migrations.py --list   # show applied and pending migrations
+"""
+import argparse
+import asyncio
+import os
+import re
+import asyncpg
+from database import ASYNCPG_DSN
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+# Arbitrary key for the advisory lock that keeps workers from migrating at the same time
+MIGRATION_LOCK_KEY = 4721001
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class Migration:
+    __slots__ = ("version", "name", "sql", "transactional")
+
+    def __init__(self, version: int, name: str, sql: str):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.transactional = not sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    # Statements of a no-transaction file, one per `;` at the end of a line. Lines inside a
+    # $$-quoted body (a DO block) belong to the statement that contains it.
+    def statements(self):
+        statements, lines, quoted = [], [], False
+        for line in self.sql.splitlines():
+            if not quoted and line.strip().startswith("--"):
+                continue
+            lines.append(line)
+            quoted ^= line.count("$$") % 2 == 1
+            if not quoted and line.rstrip().endswith(";"):
+                statements.append("\n".join(lines).strip().rstrip(";").strip())
+                lines = []
+        if "\n".join(lines).strip():
+            statements.append("\n".join(lines).strip())
+        return statements
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match is None:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+async def applied_versions(connection):
+    await connection.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+    return {row["version"] for row in await connection.fetch("SELECT version FROM schema_migrations")}
+
+
+async def apply_migration(connection, migration: Migration):
+    record = "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)"
+    if migration.transactional:
+        async with connection.transaction():
+            await connection.execute(migration.sql)
+            await connection.execute(record, migration.version, migration.name)
+    else:
+        for statement in migration.statements():
+            await connection.execute(statement)
+        await connection.execute(record, migration.version, migration.name)
+
+
+# Apply every pending migration; returns the versions applied
+async def run_migrations(dsn: str = ASYNCPG_DSN):
+    # A dedicated connection: concurrent index builds cannot run on a pooled, in-transaction one
+    connection = await asyncpg.connect(dsn)
+    applied = []
+    try:
+        await connection.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+        done = await applied_versions(connection)
+        for migration in load_migrations():
+            if migration.version in done:
+                continue
+            print(f"Applying migration {migration.version:04d}_{migration.name}")
+            await apply_migration(connection, migration)
+            applied.append(migration.version)
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+    finally:
+        await connection.close()
+    return applied
+
+
+async def list_migrations(dsn: str = ASYNCPG_DSN):
+    connection = await asyncpg.connect(dsn)
+    try:
+        done = await applied_versions(connection)
+    finally:
+        await connection.close()
+    for migration in load_migrations():
+        state = "applied" if migration.version in done else "pending"
+        print(f"{migration.version:04d}_{migration.name}  {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="show migration state instead of migrating")
+    args = parser.parse_args()
+    if args.list:
+        asyncio.run(list_migrations())
+    else:
+        applied = asyncio.run(run_migrations())
+        print(f"Applied {len(applied)} migration(s)")
+
+
+if __name__ == "__main__":
+    main()
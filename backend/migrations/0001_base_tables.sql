@@ -0,0 +1,25 @@
+-- Tables that predate versioned migrations; IF NOT EXISTS keeps existing databases untouched
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    username TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    email TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    admin_id SERIAL PRIMARY KEY,
+    adminusername TEXT NOT NULL,
+    adminpassword TEXT NOT NULL,
+    adminemail TEXT NOT NULL,
+    admincreated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    price NUMERIC(12, 2) NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    description TEXT,
+    image_url TEXT
+);
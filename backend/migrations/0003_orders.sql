@@ -0,0 +1,29 @@
+CREATE TABLE IF NOT EXISTS orders (
+    id SERIAL PRIMARY KEY,
+    -- Orders outlive the account that placed them; open reservations still expire and restock
+    user_id INTEGER REFERENCES users (user_id) ON DELETE SET NULL,
+    status TEXT NOT NULL DEFAULT 'reserved' CHECK (status IN ('reserved', 'paid', 'cancelled', 'expired')),
+    total NUMERIC(12, 2) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    expires_at TIMESTAMP NOT NULL
+);
+
+-- A line keeps the product's name and price, so it still reads correctly after the
+-- product is deleted and product_id becomes NULL
+CREATE TABLE IF NOT EXISTS order_items (
+    id SERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+    product_id INTEGER REFERENCES products (id) ON DELETE SET NULL,
+    product_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    unit_price NUMERIC(12, 2) NOT NULL,
+    UNIQUE (order_id, product_id)
+);
+
+-- Deleting a product looks its order lines up through this index
+CREATE INDEX IF NOT EXISTS order_items_product_id_idx ON order_items (product_id);
+
+CREATE INDEX IF NOT EXISTS orders_user_id_idx ON orders (user_id);
+
+-- Only open reservations are swept, so the reaper's index stays small
+CREATE INDEX IF NOT EXISTS orders_reserved_expires_at_idx ON orders (expires_at) WHERE status = 'reserved';
@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- Built concurrently so a large catalog stays writable while the indexes build.
+-- A failed concurrent build leaves an invalid index behind, hence the DROP before each CREATE.
+DROP INDEX CONCURRENTLY IF EXISTS products_search_vector_idx;
+CREATE INDEX CONCURRENTLY products_search_vector_idx ON products USING GIN (search_vector);
+
+DROP INDEX CONCURRENTLY IF EXISTS products_name_trgm_idx;
+CREATE INDEX CONCURRENTLY products_name_trgm_idx ON products USING GIN (name gin_trgm_ops);
+
+DROP INDEX CONCURRENTLY IF EXISTS products_description_trgm_idx;
+CREATE INDEX CONCURRENTLY products_description_trgm_idx ON products USING GIN (description gin_trgm_ops);
@@ -0,0 +1,31 @@
+-- migrate: no-transaction
+-- Unique lookups behind login and the duplicate checks on signup.
+-- The _uidx names stay clear of <table>_<column>_key, the names Postgres gives UNIQUE
+-- constraints, which databases created before migrations may already have.
+-- A build that failed (e.g. on existing duplicates) leaves an invalid index behind; only
+-- such an index is dropped here, so a valid one is never rebuilt. Remove the duplicates
+-- and run the migrations again.
+DO $$
+DECLARE
+    invalid regclass;
+BEGIN
+    FOR invalid IN
+        SELECT indexrelid::regclass FROM pg_index
+        WHERE NOT indisvalid
+          AND indexrelid IN (
+              to_regclass('users_username_uidx'), to_regclass('users_email_uidx'),
+              to_regclass('admins_adminusername_uidx'), to_regclass('admins_adminemail_uidx')
+          )
+    LOOP
+        EXECUTE format('DROP INDEX %s', invalid);
+    END LOOP;
+END
+$$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_username_uidx ON users (username);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_email_uidx ON users (email);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS admins_adminusername_uidx ON admins (adminusername);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS admins_adminemail_uidx ON admins (adminemail);
@@ -0,0 +1,2 @@
+-- Content hash of an uploaded product image; its resized variants are served from /static/images/<key>/
+ALTER TABLE products ADD COLUMN IF NOT EXISTS image_key TEXT;
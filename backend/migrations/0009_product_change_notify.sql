@@ -0,0 +1,81 @@
+-- Product changes are announced on the product_changes channel; each API worker LISTENs
+-- once and fans the events out to its Server-Sent Events clients.
+-- A transaction that sends NOTIFY takes a cluster-wide lock at commit, so stock-only updates
+-- (checkout, cancellation, reservation expiry) send nothing here; the API announces those
+-- itself, batched, outside the checkout transaction. Other changes are sent as one
+-- "batch" event per statement, or one "resync" when the batch would be too large.
+
+CREATE OR REPLACE FUNCTION notify_product_changes() RETURNS trigger AS $$
+DECLARE
+    -- Past this many rows (e.g. an import) clients are told to refetch instead
+    max_rows CONSTANT INTEGER := 100;
+    changes JSON;
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF (SELECT count(*) FROM (SELECT 1 FROM new_rows LIMIT max_rows + 1) AS n) > max_rows THEN
+            changes := '"resync"';
+        ELSE
+            SELECT json_agg(json_build_object(
+                'op', 'created', 'id', n.id, 'name', n.name, 'price', n.price, 'quantity', n.quantity,
+                'description', n.description, 'image_url', n.image_url, 'image_key', n.image_key
+            )) INTO changes FROM new_rows n;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF (SELECT count(*) FROM (SELECT 1 FROM old_rows LIMIT max_rows + 1) AS o) > max_rows THEN
+            changes := '"resync"';
+        ELSE
+            SELECT json_agg(json_build_object('op', 'deleted', 'id', o.id)) INTO changes FROM old_rows o;
+        END IF;
+    ELSE
+        SELECT json_agg(json_build_object(
+            'op', 'updated', 'id', n.id, 'name', n.name, 'price', n.price, 'quantity', n.quantity,
+            'description', n.description, 'image_url', n.image_url, 'image_key', n.image_key
+        )) INTO changes
+        FROM (
+            SELECT n.*
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE (o.name, o.price, o.description, o.image_url, o.image_key)
+                IS DISTINCT FROM (n.name, n.price, n.description, n.image_url, n.image_key)
+            LIMIT max_rows + 1
+        ) AS n;
+        IF json_array_length(changes) > max_rows THEN
+            changes := '"resync"';
+        END IF;
+    END IF;
+
+    IF changes IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF changes::text = '"resync"' THEN
+        payload := '{"op":"resync"}';
+    ELSE
+        payload := json_build_object('op', 'batch', 'changes', changes)::text;
+        -- NOTIFY payloads are capped at 8000 bytes
+        IF octet_length(payload) > 7900 THEN
+            payload := '{"op":"resync"}';
+        END IF;
+    END IF;
+    PERFORM pg_notify('product_changes', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_notify_insert ON products;
+CREATE TRIGGER products_notify_insert
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
+
+DROP TRIGGER IF EXISTS products_notify_update ON products;
+CREATE TRIGGER products_notify_update
+    AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
+
+DROP TRIGGER IF EXISTS products_notify_delete ON products;
+CREATE TRIGGER products_notify_delete
+    AFTER DELETE ON products
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
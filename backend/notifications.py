@@ -0,0 +1,71 @@
+import asyncio
+import asyncpg
+from background import BackgroundTask
+from database import ASYNCPG_DSN, database
+
+# Seconds to wait before reconnecting after the listen connection drops
+RECONNECT_DELAY = 2.0
+
+
+# Holds one dedicated connection per worker for Postgres LISTEN/NOTIFY.
+# Pooled connections are handed back after every query, so they cannot keep a LISTEN open.
+class PgListener:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._channels = {}
+        self._connect_callbacks = []
+        self._task = BackgroundTask(self._run)
+
+    # Register callback(payload) for a channel; must be called before start()
+    def subscribe(self, channel: str, callback):
+        self._channels.setdefault(channel, []).append(callback)
+
+    # Register callback() to run on every (re)connect, when notifications may have been missed
+    def on_connect(self, callback):
+        self._connect_callbacks.append(callback)
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in self._channels.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception as exc:
+                print(f"Listener callback for {channel} failed: {exc}")
+
+    async def _run(self):
+        while True:
+            closed = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                print(f"Listener connection failed: {exc}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            try:
+                connection.add_termination_listener(lambda _: closed.set())
+                for channel in self._channels:
+                    await connection.add_listener(channel, self._dispatch)
+                for callback in self._connect_callbacks:
+                    callback()
+                await closed.wait()
+            except (OSError, asyncpg.PostgresError) as exc:
+                print(f"Listener connection lost: {exc}")
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def start(self):
+        if self._channels:
+            self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+# Shared listener for this worker
+listener = PgListener(ASYNCPG_DSN)
+
+
+# Send a notification through the pool; every worker's listener receives it, including our own
+async def notify(channel: str, payload: str):
+    await database.execute(query="SELECT pg_notify(:channel, :payload)", values={"channel": channel, "payload": payload})
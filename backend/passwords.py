@@ -0,0 +1,90 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# scrypt cost: N=2**14, r=8 takes tens of milliseconds and 16 MiB per hash.
+# Changing these makes existing hashes get upgraded on the next successful login.
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+# Hashing never runs on the event loop. OpenSSL's scrypt releases the GIL, so threads
+# use several cores; "process" isolates the work entirely at the cost of pickling.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+HASH_PREFIX = "scrypt"
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=32)
+
+
+def _b64(data: bytes):
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+# Blocking helpers; these run inside the executor
+def hash_password_sync(password: str):
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+# Returns (matches, new_hash). new_hash is set when the stored value is a legacy
+# plaintext row or uses old cost parameters and should be replaced.
+def verify_password_sync(password: str, stored: str):
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != HASH_PREFIX:
+        # Legacy row written before server-side hashing: the value is what the client sent
+        if hmac.compare_digest(password.encode(), stored.encode()):
+            return True, hash_password_sync(password)
+        return False, None
+    n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+    digest = _scrypt(password, _unb64(parts[4]), n, r, p)
+    if not hmac.compare_digest(digest, _unb64(parts[5])):
+        return False, None
+    if (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P):
+        return True, hash_password_sync(password)
+    return True, None
+
+
+async def hash_password(password: str):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), hash_password_sync, password)
+
+
+async def verify_password(password: str, stored: str):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), verify_password_sync, password, stored)
+
+
+# Hash compared against when the account does not exist, so a wrong email costs
+# the same time as a wrong password
+DUMMY_HASH = f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(bytes(16))}${_b64(bytes(32))}"
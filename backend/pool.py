@@ -0,0 +1,62 @@
+import asyncio
+import time
+from collections import deque
+
+# Acquire latencies kept for percentiles
+LATENCY_SAMPLES = 2048
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+# Wraps an asyncpg pool to count waiters and time acquires.
+# Everything else (release, close, get_size, ...) is passed through to the real pool.
+class InstrumentedPool:
+    def __init__(self, pool, acquire_timeout: float | None = None):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    async def acquire(self, *, timeout: float | None = None):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=timeout or self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        self._latencies.append(time.perf_counter() - started)
+        self.acquired += 1
+        return connection
+
+    def stats(self):
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        latencies = sorted(self._latencies)
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.waiting,
+            "acquired_total": self.acquired,
+            "acquire_timeouts_total": self.timeouts,
+            "acquire_latency_ms": {
+                "p50": None if not latencies else percentile(latencies, 0.50) * 1000,
+                "p95": None if not latencies else percentile(latencies, 0.95) * 1000,
+                "p99": None if not latencies else percentile(latencies, 0.99) * 1000,
+                "max": None if not latencies else latencies[-1] * 1000,
+            },
+        }
@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field, make_dataclass
+from decimal import Decimal
+from functools import lru_cache
+from images import image_variant_urls
+
+# Typed product rows for the catalog endpoints. Slots keep them small and orjson
+# serializes dataclasses natively, so a row goes from DB record to JSON bytes
+# without a dict copy or a jsonable_encoder walk.
+
+# Python type of each product column, in table order
+PRODUCT_FIELD_TYPES = {
+    "id": int,
+    "name": str,
+    "price": Decimal,
+    "quantity": int,
+    "description": str | None,
+    "image_url": str | None,
+    "image_key": str | None,
+}
+
+
+# Rows that carry an image_key also expose the URLs of its resized variants
+def _set_images(self):
+    self.images = image_variant_urls(self.image_key)
+
+
+@dataclass(slots=True)
+class Product:
+    id: int
+    name: str
+    price: Decimal
+    quantity: int
+    description: str | None
+    image_url: str | None
+    image_key: str | None
+    images: dict | None = field(init=False, default=None)
+
+    __post_init__ = _set_images
+
+
+# Search hit: a product plus its relevance score
+@dataclass(slots=True)
+class ProductSearchResult:
+    id: int
+    name: str
+    price: Decimal
+    quantity: int
+    description: str | None
+    image_url: str | None
+    image_key: str | None
+    rank: float
+    images: dict | None = field(init=False, default=None)
+
+    __post_init__ = _set_images
+
+
+# Slot dataclass for a projected listing (?fields=...), built once per column set
+@lru_cache(maxsize=64)
+def product_model(columns: tuple[str, ...]):
+    if columns == tuple(PRODUCT_FIELD_TYPES):
+        return Product
+    fields = [(column, PRODUCT_FIELD_TYPES[column]) for column in columns]
+    namespace = {}
+    if "image_key" in columns:
+        fields.append(("images", dict | None, field(init=False, default=None)))
+        namespace["__post_init__"] = _set_images
+    return make_dataclass("ProductFields", fields, namespace=namespace, slots=True)
+
+
+# Build a model instance straight from a `databases` record
+def from_record(model, record):
+    return model(**record._mapping)
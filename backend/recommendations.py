@@ -0,0 +1,108 @@
+import asyncio
+import dataclasses
+import os
+import random
+import time
+import orjson
+from background import BackgroundTask
+from database import get_recommendation_candidates
+from product import from_record, product_model
+
+RECOMMENDATION_POOL_SIZE = int(os.getenv("RECOMMENDATION_POOL_SIZE", "500"))
+RECOMMENDATION_REFRESH_INTERVAL = float(os.getenv("RECOMMENDATION_REFRESH_INTERVAL", "60"))
+# Least time between rebuilds; catalog changes arriving sooner wait and share one rebuild
+RECOMMENDATION_MIN_REFRESH_INTERVAL = float(os.getenv("RECOMMENDATION_MIN_REFRESH_INTERVAL", "10"))
+
+RecommendedProduct = product_model(("id", "name", "price", "quantity", "image_url", "image_key"))
+
+
+# Precomputed set of in-stock products to recommend from, refreshed in the background.
+# Sampling only touches this in-memory list, so a request never scans the products table.
+class RecommendationPool:
+    def __init__(self, size: int, interval: float, min_interval: float = 0.0):
+        self.size = size
+        self.interval = interval
+        self.min_interval = min_interval
+        self._refreshed_at = float("-inf")
+        self._products = []
+        self._cum_weights = []
+        self._stale = asyncio.Event()
+        self._task = BackgroundTask(self._run)
+
+    async def refresh(self):
+        self._refreshed_at = time.monotonic()
+        rows = await get_recommendation_candidates(self.size)
+        self._swap([from_record(RecommendedProduct, row) for row in rows])
+
+    def _swap(self, products: list):
+        cum_weights = []
+        total = 0
+        for product in products:
+            total += product.quantity
+            cum_weights.append(total)
+        # Swap both lists at once so a concurrent sample never sees a half-built pool
+        self._products, self._cum_weights = products, cum_weights
+
+    # Ask the refresh loop to rebuild the pool now instead of at the next interval
+    def mark_stale(self, payload=None):
+        self._stale.set()
+
+    # Listener callback for events.PRODUCT_CHANNEL. Stock changes are applied in place and
+    # sold-out products leave the pool; any other change rebuilds it.
+    def on_product_change(self, payload: str):
+        message = orjson.loads(payload)
+        if message["op"] == "resync" or any(change["op"] != "stock" for change in message["changes"]):
+            self.mark_stale()
+            return
+        stock = {change["id"]: change["quantity"] for change in message["changes"]}
+        if not any(product.id in stock for product in self._products):
+            return
+        products = []
+        for product in self._products:
+            quantity = stock.get(product.id, product.quantity)
+            if quantity > 0:
+                products.append(product if quantity == product.quantity else dataclasses.replace(product, quantity=quantity))
+        self._swap(products)
+
+    # Pick up to n distinct products, weighted by stock on hand
+    def sample(self, n: int):
+        products, cum_weights = self._products, self._cum_weights
+        if n >= len(products):
+            return random.sample(products, len(products))
+        picked = {}
+        for _ in range(4):
+            for product in random.choices(products, cum_weights=cum_weights, k=n):
+                picked.setdefault(product.id, product)
+            if len(picked) >= n:
+                return list(picked.values())[:n]
+        # A few heavily stocked items dominate the weights; top up uniformly
+        remaining = [product for product in products if product.id not in picked]
+        return list(picked.values()) + random.sample(remaining, n - len(picked))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(max(0.0, self._refreshed_at + self.min_interval - time.monotonic()))
+            self._stale.clear()
+            try:
+                await self.refresh()
+            except Exception as exc:
+                print(f"Recommendation refresh failed: {exc}")
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as exc:
+            print(f"Recommendation refresh failed: {exc}")
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+recommendation_pool = RecommendationPool(
+    RECOMMENDATION_POOL_SIZE, RECOMMENDATION_REFRESH_INTERVAL, RECOMMENDATION_MIN_REFRESH_INTERVAL
+)
@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import itertools
+import sys
+import time
+import asyncpg
+from functools import partial
+from background import BackgroundTask, run_every
+
+# Errors that mean the replica itself is unusable (down, restarting, pool exhausted),
+# as opposed to a problem with the query. Reads that hit one are retried on the primary.
+REPLICA_UNAVAILABLE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.exceptions.CannotConnectNowError,
+)
+
+# Seconds behind the primary; 0 when the replica has replayed everything it received,
+# so an idle primary does not make a caught-up replica look lagged
+REPLICATION_LAG_QUERY = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+# Read-your-writes cookie: a client that wrote recently reads from the primary until this time
+PIN_COOKIE = "pgro_primary_until"
+
+# Monotonic deadline until which reads in the current request go to the primary
+_pinned_until = contextvars.ContextVar("pinned_until", default=0.0)
+
+
+class Replica:
+    __slots__ = ("database", "healthy", "lag")
+
+    def __init__(self, database):
+        self.database = database
+        self.healthy = False
+        self.lag = None
+
+
+# Sends read-only helpers to a healthy replica (round robin) and everything else to the
+# primary. A replica that errors or falls more than max_lag seconds behind is skipped until
+# the background health check sees it recover; with none left, reads go to the primary.
+class ReplicaRouter:
+    def __init__(self, primary, replicas: list, max_lag: float, check_interval: float, pin_window: float):
+        self.primary = primary
+        self.replicas = [Replica(database) for database in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.pin_window = pin_window
+        # Process-wide pin, e.g. right after a catalog change every worker is told about
+        self._pinned_until = 0.0
+        self._cycle = itertools.cycle(self.replicas)
+        self._task = BackgroundTask(partial(run_every, check_interval, self.check_all, "Replica check"))
+
+    # Send this request's reads to the primary for the pin window
+    def pin_primary(self, seconds: float | None = None):
+        _pinned_until.set(time.monotonic() + (self.pin_window if seconds is None else seconds))
+
+    # Listener callback: the catalog just changed, so for the pin window every read on this
+    # worker goes to the primary and the refilled catalog cache cannot pick up a lagging copy
+    def pin_all(self, payload=None):
+        self._pinned_until = time.monotonic() + self.pin_window
+
+    def reader(self):
+        now = time.monotonic()
+        if not self.replicas or _pinned_until.get() > now or self._pinned_until > now:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica.healthy:
+                return replica
+        return None
+
+    async def _read(self, method: str, name: str, query, values, **kwargs):
+        replica = self.reader()
+        if replica is not None:
+            try:
+                return await getattr(replica.database, method)(query=query, values=values, name=name, **kwargs)
+            except REPLICA_UNAVAILABLE_ERRORS as exc:
+                replica.healthy = False
+                print(f"Replica read failed, using the primary: {exc}")
+        return await getattr(self.primary, method)(query=query, values=values, name=name, **kwargs)
+
+    # Same call signatures as the Database read methods, so a helper only swaps the object
+    async def fetch_all(self, query, values=None, name=None):
+        return await self._read("fetch_all", name or sys._getframe(1).f_code.co_name, query, values)
+
+    async def fetch_one(self, query, values=None, name=None):
+        return await self._read("fetch_one", name or sys._getframe(1).f_code.co_name, query, values)
+
+    async def fetch_val(self, query, values=None, column=0, name=None):
+        return await self._read("fetch_val", name or sys._getframe(1).f_code.co_name, query, values, column=column)
+
+    async def check(self, replica: Replica):
+        try:
+            if not replica.database.is_connected:
+                await replica.database.connect()
+            replica.lag = float(await replica.database.fetch_val(REPLICATION_LAG_QUERY, name="replica_lag"))
+            replica.healthy = replica.lag <= self.max_lag
+        except (*REPLICA_UNAVAILABLE_ERRORS, asyncpg.PostgresError) as exc:
+            if replica.healthy:
+                print(f"Replica marked unhealthy: {exc}")
+            replica.healthy = False
+            replica.lag = None
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    def stats(self):
+        return [{"healthy": replica.healthy, "lag_seconds": replica.lag} for replica in self.replicas]
+
+    async def start(self):
+        if not self.replicas:
+            return
+        await self.check_all()
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+            replica.healthy = False
+
+
+# Read-your-writes across requests. A request that may write (anything but GET/HEAD/OPTIONS)
+# reads from the primary and gets a short-lived cookie; the client's following requests
+# read from the primary too until it expires, by which time the replicas have caught up.
+class ReadYourWritesMiddleware:
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.replicas:
+            await self.app(scope, receive, send)
+            return
+        now = time.time()
+        # Capped at the window, so a hand-edited cookie cannot pin a client forever
+        remaining = min(self._cookie_deadline(scope) - now, self.router.pin_window)
+        if remaining > 0:
+            self.router.pin_primary(remaining)
+        if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        window = self.router.pin_window
+        self.router.pin_primary(window)
+        cookie = f"{PIN_COOKIE}={now + window:.3f}; Max-Age={int(window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    @staticmethod
+    def _cookie_deadline(scope):
+        for key, value in scope["headers"]:
+            if key != b"cookie":
+                continue
+            for part in value.decode("latin-1").split(";"):
+                name, _, deadline = part.strip().partition("=")
+                if name == PIN_COOKIE:
+                    try:
+                        return float(deadline)
+                    except ValueError:
+                        return 0.0
+        return 0.0
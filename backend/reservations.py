@@ -0,0 +1,37 @@
+import os
+from functools import partial
+from background import BackgroundTask, run_every
+from database import release_expired_reservations
+from events import stock_events
+
+# How long checkout holds stock before an unpaid order expires
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", "900"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+
+
+# Background task that expires unpaid reservations and returns their stock
+class ReservationReaper:
+    def __init__(self, interval: float, batch: int):
+        self.interval = interval
+        self.batch = batch
+        self._task = BackgroundTask(partial(run_every, interval, self.sweep, "Reservation sweep", immediately=True))
+
+    # Release everything that is overdue, one batch per transaction
+    async def sweep(self):
+        total = 0
+        while True:
+            released, product_ids = await release_expired_reservations(self.batch)
+            stock_events.record(product_ids)
+            total += released
+            if released < self.batch:
+                return total
+
+    async def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+reservation_reaper = ReservationReaper(RESERVATION_SWEEP_INTERVAL, RESERVATION_SWEEP_BATCH)
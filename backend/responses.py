@@ -0,0 +1,23 @@
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse
+
+
+# orjson handles dataclasses, datetimes and lists natively; teach it the rest
+def orjson_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    # `databases` records
+    if hasattr(obj, "_mapping"):
+        return dict(obj._mapping)
+    raise TypeError
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=orjson_default)
+
+
+# Default response class for the API routers
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
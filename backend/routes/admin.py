@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from dataclasses import dataclass
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from asyncpg.exceptions import UniqueViolationError
 from database import *  # Ensure your database functions are correctly implemented
+from responses import ORJSONResponse
+from auth import issue_tokens, require_admin
+from passwords import DUMMY_HASH, hash_password, verify_password
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Pydantic model for admin creation
 class AdminCreate(BaseModel):
@@ -30,6 +35,20 @@ class AdminLogin(BaseModel):
     adminemail: str
     adminpassword: str
 
+# What the endpoints actually send: a slot dataclass that orjson encodes directly, skipping
+# response_model validation (Admin above still documents the shape)
+@dataclass(slots=True)
+class AdminRecord:
+    admin_id: int
+    adminusername: str
+    adminemail: str
+    admincreated_at: datetime
+
+def admin_response(record):
+    return ORJSONResponse(
+        AdminRecord(record["admin_id"], record["adminusername"], record["adminemail"], record["admincreated_at"])
+    )
+
 
 # Function to insert a new user into the admins table
 async def insert_admin(adminusername: str, adminpassword: str, adminemail: str):
@@ -44,7 +63,7 @@ async def insert_admin(adminusername: str, adminpassword: str, adminemail: str):
 # Function to select an admin by admin_id
 async def get_admin(admin_id: int):
     query = "SELECT * FROM admins WHERE admin_id = :admin_id"
-    return await database.fetch_one(query=query, values={"admin_id": admin_id})
+    return await replica_router.fetch_one(query=query, values={"admin_id": admin_id})
 
 # Function to select an admin by adminusername
 async def get_admin_by_username(adminusername: str):
@@ -69,13 +88,20 @@ async def update_admin(admin_id: int, adminusername: str, adminpassword: Optiona
     values = {"admin_id": admin_id, "adminusername": adminusername, "adminpassword": adminpassword, "adminemail": adminemail}
     return await database.fetch_one(query=query, values=values)
 
+# Function to replace an admin's stored password hash
+async def update_admin_password(admin_id: int, adminpassword: str):
+    query = "UPDATE admins SET adminpassword = :adminpassword WHERE admin_id = :admin_id"
+    return await database.execute(query=query, values={"admin_id": admin_id, "adminpassword": adminpassword})
+
 # Function to delete an admin
 async def delete_admin(admin_id: int):
     query = "DELETE FROM admins WHERE admin_id = :admin_id RETURNING *"
     return await database.fetch_one(query=query, values={"admin_id": admin_id})
 
 
-@router.post("/admin/create", response_model=Admin)
+# Endpoint to create an admin; only an existing admin may do this.
+# The first admin is created from the command line: python create_admin.py
+@router.post("/admin/create", response_model=Admin, dependencies=[Depends(require_admin)])
 async def create_admin(admin: AdminCreate):
     # Check if the username already exists
     existing_admin_username = await get_admin_by_username(admin.adminusername)
@@ -88,31 +114,35 @@ async def create_admin(admin: AdminCreate):
         raise HTTPException(status_code=400, detail="Email already exists")  # แจ้งว่าอีเมลมีอยู่แล้ว
 
     # Insert the new admin
-    result = await insert_admin(admin.adminusername, admin.adminpassword, admin.adminemail)
+    try:
+        result = await insert_admin(admin.adminusername, await hash_password(admin.adminpassword), admin.adminemail)
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     if result is None:
         raise HTTPException(status_code=400, detail="Error creating user")
     
-    return result
+    return admin_response(result)
 
 
 # Endpoint to get an admin user by admin_id
-@router.get("/admin/{admin_id}", response_model=Admin)
+@router.get("/admin/{admin_id}", response_model=Admin, dependencies=[Depends(require_admin)])
 async def read_admin(admin_id: int):
     result = await get_admin(admin_id)
     if result is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return result
+    return admin_response(result)
 
 # Endpoint to update an admin user
-@router.put("/admin/{admin_id}", response_model=Admin)
+@router.put("/admin/{admin_id}", response_model=Admin, dependencies=[Depends(require_admin)])
 async def update_admin_endpoint(admin_id: int, admin: AdminUpdate):
-    result = await update_admin(admin_id, admin.adminusername, admin.adminpassword, admin.adminemail)
+    adminpassword = None if admin.adminpassword is None else await hash_password(admin.adminpassword)
+    result = await update_admin(admin_id, admin.adminusername, adminpassword, admin.adminemail)
     if result is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return result
+    return admin_response(result)
 
 # Endpoint to delete an admin user
-@router.delete("/admin/{admin_id}")
+@router.delete("/admin/{admin_id}", dependencies=[Depends(require_admin)])
 async def delete_admin_endpoint(admin_id: int):
     result = await delete_admin(admin_id)
     if result is None:
@@ -123,15 +153,21 @@ async def delete_admin_endpoint(admin_id: int):
 @router.post("/admin/login")
 async def login_admin(admin: AdminLogin):
     db_admin = await get_admin_by_email(admin.adminemail)
-    if db_admin is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if db_admin['adminpassword'] != admin.adminpassword:  # Check password here
+
+    # Verify off the event loop; unknown emails cost the same and get the same answer as
+    # wrong passwords, so neither timing nor status reveals which admin emails exist
+    matches, new_hash = await verify_password(admin.adminpassword, DUMMY_HASH if db_admin is None else db_admin['adminpassword'])
+    if db_admin is None or not matches:
         raise HTTPException(status_code=400, detail="Wrong password")  # แจ้งว่ารหัสผ่านไม่ถูกต้อง
 
-    return {
+    # Upgrade legacy plaintext rows and outdated hashes now that we know the password
+    if new_hash is not None:
+        await update_admin_password(db_admin['admin_id'], new_hash)
+
+    return ORJSONResponse({
         "admin_id": db_admin["admin_id"],
         "adminusername": db_admin["adminusername"],
         "adminemail": db_admin["adminemail"],
-        "admincreated_at": db_admin["admincreated_at"]
-    }
+        "admincreated_at": db_admin["admincreated_at"],
+        **issue_tokens(db_admin["admin_id"], "admin")
+    })
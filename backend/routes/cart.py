@@ -1,10 +1,62 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from asyncpg.exceptions import ForeignKeyViolationError
 from database import *
+from auth import require_user
 
-router = APIRouter()
+# Every cart route is scoped to /cart/{user_id}; only that user (or an admin) may use it
+router = APIRouter(dependencies=[Depends(require_user)])
 
+# Pydantic model for adding to a cart line
+class CartItemAdd(BaseModel):
+    product_id: int
+    quantity: int = Field(1, ge=1)
+
+# Pydantic model for setting a cart line's quantity
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(..., ge=1)
+
+
+# Endpoint to get a user's cart
 @router.get("/cart/{user_id}")
 async def get_cart(user_id: int):
-    cart_items = await database.get_cart_items(user_id)
+    cart_items = await get_cart_items(user_id)
     return cart_items
 
+# Endpoint to add one or more products to a cart in a single statement
+@router.post("/cart/{user_id}/items")
+async def add_to_cart(user_id: int, items: list[CartItemAdd]):
+    if not items:
+        raise HTTPException(status_code=400, detail="No items given")
+    # One row per product, otherwise ON CONFLICT would touch the same line twice
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    try:
+        result = await add_cart_items(user_id, list(quantities), list(quantities.values()))
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="User or product not found")
+    return result
+
+# Endpoint to set the quantity of a cart line
+@router.put("/cart/{user_id}/items/{product_id}")
+async def update_cart_item(user_id: int, product_id: int, item: CartItemUpdate):
+    try:
+        result = await set_cart_item(user_id, product_id, item.quantity)
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="User or product not found")
+    return result
+
+# Endpoint to remove a product from a cart
+@router.delete("/cart/{user_id}/items/{product_id}")
+async def remove_from_cart(user_id: int, product_id: int):
+    result = await delete_cart_item(user_id, product_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    return {"detail": "Item removed"}
+
+# Endpoint to empty a cart
+@router.delete("/cart/{user_id}")
+async def clear_cart_endpoint(user_id: int):
+    await clear_cart(user_id)
+    return {"detail": "Cart cleared"}
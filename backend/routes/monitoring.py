@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from database import get_pool_stats, replica_router
+from metrics import collect_pool_stats, render_metrics
+
+router = APIRouter()
+
+# Router for scrape endpoints that live outside /api
+metrics_router = APIRouter()
+
+# Endpoint to see connection pool saturation: totals over every worker of the server plus
+# each worker's own stats under "workers" when run by serve.py, else this worker's stats
+@router.get("/stats/pool")
+async def read_pool_stats():
+    stats = collect_pool_stats(get_pool_stats())
+    if stats is None:
+        raise HTTPException(status_code=503, detail="Database not connected")
+    return stats
+
+# Endpoint to see which read replicas this worker is using and how far behind they are
+@router.get("/stats/replicas")
+async def read_replica_stats():
+    return replica_router.stats()
+
+# Endpoint for Prometheus to scrape request, query and pool metrics (summed over workers
+# when run by serve.py, so any worker answering the scrape reports the whole server)
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(render_metrics(get_pool_stats()), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,97 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from asyncpg.exceptions import DeadlockDetectedError, ForeignKeyViolationError
+from database import *
+from reservations import RESERVATION_TTL
+from events import stock_events
+from auth import Principal, check_owner, current_principal
+
+router = APIRouter()
+
+# Retries for the rare deadlock between two multi-item orders
+RESERVE_ATTEMPTS = 3
+
+# Pydantic model for one order line
+class OrderItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., ge=1)
+
+# Pydantic model for checkout; without items the user's cart is checked out
+class OrderCreate(BaseModel):
+    user_id: int
+    items: Optional[list[OrderItem]] = None
+
+
+# Get an order the caller is allowed to act on
+async def owned_order(order_id: int, principal: Principal):
+    result = await get_order(order_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    check_owner(principal, result["user_id"])
+    return result
+
+async def order_response(order):
+    items = await get_order_items(order["id"])
+    return {**dict(order._mapping), "items": items}
+
+
+# Endpoint to check out: reserves stock and creates an order that must be paid before it expires
+@router.post("/orders", status_code=201)
+async def create_order(order: OrderCreate, principal: Principal = Depends(current_principal)):
+    check_owner(principal, order.user_id)
+    from_cart = order.items is None
+    if from_cart:
+        lines = [(row["id"], row["quantity"]) for row in await get_cart_items(order.user_id)]
+    else:
+        lines = [(item.product_id, item.quantity) for item in order.items]
+    if not lines:
+        raise HTTPException(status_code=400, detail="No items to order")
+
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    # Lock rows in a consistent order so concurrent multi-item orders rarely deadlock
+    product_ids = sorted(quantities)
+
+    for attempt in range(RESERVE_ATTEMPTS):
+        try:
+            result = await reserve_order(order.user_id, product_ids, [quantities[i] for i in product_ids], RESERVATION_TTL)
+            break
+        except DeadlockDetectedError:
+            if attempt == RESERVE_ATTEMPTS - 1:
+                raise HTTPException(status_code=503, detail="Checkout busy, try again")
+        except ForeignKeyViolationError:
+            raise HTTPException(status_code=404, detail="User not found")
+    if result is None:
+        raise HTTPException(status_code=409, detail="Product not found or out of stock")
+    stock_events.record(product_ids)
+
+    if from_cart:
+        await clear_cart(order.user_id)
+    return await order_response(result)
+
+# Endpoint to get an order
+@router.get("/orders/{order_id}")
+async def read_order(order_id: int, principal: Principal = Depends(current_principal)):
+    result = await owned_order(order_id, principal)
+    return await order_response(result)
+
+# Endpoint to pay for a reserved order
+@router.post("/orders/{order_id}/pay")
+async def pay_order_endpoint(order_id: int, principal: Principal = Depends(current_principal)):
+    await owned_order(order_id, principal)
+    result = await pay_order(order_id)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Order is not awaiting payment or has expired")
+    return await order_response(result)
+
+# Endpoint to cancel a reserved order and release its stock
+@router.post("/orders/{order_id}/cancel")
+async def cancel_order_endpoint(order_id: int, principal: Principal = Depends(current_principal)):
+    await owned_order(order_id, principal)
+    product_ids = await cancel_order(order_id)
+    if product_ids is None:
+        raise HTTPException(status_code=409, detail="Order is not awaiting payment")
+    stock_events.record(product_ids)
+    return {"detail": "Order cancelled"}
@@ -1,14 +1,173 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import re
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from asyncpg.exceptions import DataError, ForeignKeyViolationError, IntegrityConstraintViolationError, QueryCanceledError
 from database import *
+from transfer import csv_chunks, ndjson_chunks, ndjson_records, read_csv_header
+from cache import STOCK_CACHE_TTL, catalog_cache, cached_response, invalidate_catalog
+from recommendations import recommendation_pool
+from events import PRODUCT_CHANNEL, RESYNC_PAYLOAD, product_events, stock_events
+from notifications import notify
+from product import Product, ProductSearchResult, from_record, product_model
+from responses import ORJSONResponse
+from auth import require_admin
+from images import (
+    IMAGE_KEY_PATTERN,
+    MAX_IMAGE_BYTES,
+    generate_variants,
+    image_key,
+    image_status,
+    image_variant_urls,
+    mark_image_failed,
+    probe_image,
+    reclaim_original,
+    run_in_background,
+    store_original,
+)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
-@router.get("/products")
-async def read_products():
-    products = await get_products()
-    return products
+# Page size bounds for the product listing
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
-@router.post("/products")
+# Bounds for search paging; deep offsets on ranked results get expensive
+MAX_SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_OFFSET = 1000
+
+# Largest batch accepted by the bulk update endpoint
+MAX_PATCH_ITEMS = 1000
+
+# Pydantic model for a partial product update; omitted fields are left unchanged
+class ProductPatch(BaseModel):
+    id: int
+    name: Optional[str] = None
+    price: Optional[float] = Field(None, ge=0)
+    quantity: Optional[int] = Field(None, ge=0)
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+
+# Turn "id,name,price" into a validated column tuple; id is always kept for the cursor
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return PRODUCT_COLUMNS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PRODUCT_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return tuple(dict.fromkeys(requested))
+
+# Endpoint to list products one page at a time
+# The next page is requested with ?cursor=<X-Next-Cursor of the previous response>
+@router.get("/products", response_model=list[Product])
+async def read_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
+    columns = parse_fields(fields)
+    key = f"products:{limit}:{cursor}:{','.join(columns)}"
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        # Fetch one extra row to know whether another page exists without a COUNT(*)
+        rows = await get_products(limit=limit + 1, after_id=cursor, fields=columns)
+        model = product_model(columns)
+        products = [from_record(model, row) for row in rows[:limit]]
+        headers = {}
+        if len(rows) > limit:
+            headers["X-Next-Cursor"] = str(products[-1].id)
+        entry = catalog_cache.set(key, products, headers, version, ttl=STOCK_CACHE_TTL if "quantity" in columns else None)
+    return cached_response(request, entry)
+
+# Endpoint to get n recommended products, sampled from the precomputed pool
+@router.get("/products/recommended")
+async def read_recommended_products(n: int = Query(3, ge=1, le=50)):
+    return ORJSONResponse(recommendation_pool.sample(n))
+
+# Endpoint streaming product changes as Server-Sent Events. A "product" event carries
+# {"op": "batch", "changes": [{"op": created|updated|stock|deleted, "id", ...}]};
+# "resync" means refetch the list.
+@router.get("/products/events")
+async def product_events_endpoint(request: Request):
+    if product_events.full():
+        raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "5"})
+    resync = request.headers.get("last-event-id") is not None
+    return StreamingResponse(
+        product_events.stream(resync),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Turn free text into a prefix tsquery ("red sho" -> "red:* & sho:*") for type-ahead
+def prefix_tsquery(text: str):
+    words = re.findall(r"\w+", text.lower())
+    return " & ".join(f"{word}:*" for word in words)
+
+# Endpoint to search products by name and description, best matches first
+@router.get("/products/search", response_model=list[ProductSearchResult])
+async def search_products_endpoint(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+):
+    text = q.strip()
+    tsquery = prefix_tsquery(text)
+    if not tsquery:
+        return []
+    key = f"search:{limit}:{offset}:{text.lower()}"
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        rows = await search_products(text, tsquery, limit, offset)
+        entry = catalog_cache.set(
+            key, [from_record(ProductSearchResult, row) for row in rows], version=version, ttl=STOCK_CACHE_TTL
+        )
+    return cached_response(request, entry)
+
+# Endpoint to bulk import products from a CSV (with header) or NDJSON request body.
+# CSV columns are matched by header name, in any order. Rows with a known id update that
+# product; the rest are inserted.
+@router.post("/products/import", dependencies=[Depends(require_admin)])
+async def import_products_endpoint(request: Request, format: Literal["csv", "ndjson"] = "csv"):
+    try:
+        if format == "csv":
+            columns, body = await read_csv_header(request.stream())
+            result = await import_products(csv_source=body, columns=columns)
+        else:
+            result = await import_products(records=ndjson_records(request.stream()))
+    except (ValueError, DataError, IntegrityConstraintViolationError) as exc:
+        raise HTTPException(status_code=400, detail=f"Import failed: {exc}")
+    except (asyncio.TimeoutError, QueryCanceledError):
+        # Nothing was imported: the transaction rolled back
+        raise HTTPException(
+            status_code=504,
+            detail=f"Import took longer than {DB_COPY_TIMEOUT:g} seconds and was rolled back; split the file or raise DB_COPY_TIMEOUT",
+        )
+    await invalidate_catalog()
+    # Too many rows to send as events; event stream clients refetch instead
+    await notify(PRODUCT_CHANNEL, RESYNC_PAYLOAD)
+    return result
+
+# Endpoint to stream every product as CSV or NDJSON with constant memory
+@router.get("/products/export", dependencies=[Depends(require_admin)])
+async def export_products(format: Literal["csv", "ndjson"] = "csv"):
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(iter_all_products()),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="products.csv"'},
+        )
+    return StreamingResponse(ndjson_chunks(iter_all_products()), media_type="application/x-ndjson")
+
+@router.post("/products", dependencies=[Depends(require_admin)])
 async def create_product(product: dict):
     new_product = await insert_product(
         name=product['name'],
@@ -17,9 +176,90 @@ async def create_product(product: dict):
         description=product['description'],
         image_url=product['image_url']
     )
+    await invalidate_catalog()
     return new_product
 
-@router.put("/products/{product_id}")
+# Endpoint to update many products at once with a single set-based statement
+@router.patch("/products", dependencies=[Depends(require_admin)])
+async def patch_products_endpoint(patches: list[ProductPatch]):
+    if not patches:
+        raise HTTPException(status_code=400, detail="No updates given")
+    if len(patches) > MAX_PATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATCH_ITEMS} updates per request")
+    ids = [patch.id for patch in patches]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Each product may appear only once")
+
+    rows = await patch_products(
+        ids,
+        [patch.name for patch in patches],
+        [patch.price for patch in patches],
+        [patch.quantity for patch in patches],
+        [patch.description for patch in patches],
+        [patch.image_url for patch in patches],
+    )
+    if rows:
+        await invalidate_catalog()
+        # The products trigger skips stock-only changes; announce quantities separately
+        stock_events.record(row["id"] for row in rows)
+    updated = {row["id"]: row for row in rows}
+    return [
+        {"id": product_id, "status": "updated", "product": updated[product_id]}
+        if product_id in updated
+        else {"id": product_id, "status": "not_found"}
+        for product_id in ids
+    ]
+
+# Resize an uploaded image in the process pool, then point the product at it. A failure is
+# recorded next to the original for the status endpoint to report.
+async def attach_product_image(product_id: int, data: bytes, key: str):
+    try:
+        await generate_variants(data, key)
+        if await set_product_image(product_id, key, image_variant_urls(key)["large"]["jpeg"]) is not None:
+            await invalidate_catalog()
+    except Exception as exc:
+        print(f"Image processing for product {product_id} failed: {exc}")
+        await mark_image_failed(key, str(exc) or type(exc).__name__)
+
+# Endpoint to upload a product image. The upload is checked and its original stored before
+# answering; the resized variants are generated in the background and the product switches
+# to them when done. Poll status_url until it reports "ready" (or "failed").
+@router.post("/products/{product_id}/image", status_code=202, dependencies=[Depends(require_admin)])
+async def upload_product_image(product_id: int, file: UploadFile = File(...)):
+    data = await file.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    if await get_product_by_id(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    try:
+        image_format = await probe_image(data)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Not a supported image")
+    key = image_key(data)
+    await store_original(data, key, image_format)
+    run_in_background(attach_product_image(product_id, data, key))
+    return {"image_key": key, "status": "processing", "status_url": f"/api/products/{product_id}/image/{key}"}
+
+# Endpoint to follow an image upload: "processing", then "ready" with the variant URLs, or
+# "failed" with the error. Processing lost to a worker restart is started again from the
+# stored original.
+@router.get("/products/{product_id}/image/{key}", dependencies=[Depends(require_admin)])
+async def read_product_image_status(product_id: int, key: str):
+    if not IMAGE_KEY_PATTERN.match(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    status, error = await image_status(key)
+    if status == "missing":
+        raise HTTPException(status_code=404, detail="Image not found")
+    if status == "stalled":
+        data = await reclaim_original(key)
+        if data is not None:
+            run_in_background(attach_product_image(product_id, data, key))
+        status = "processing"
+    if status == "ready":
+        return {"image_key": key, "status": status, "images": image_variant_urls(key)}
+    return {"image_key": key, "status": status, "error": error}
+
+@router.put("/products/{product_id}", dependencies=[Depends(require_admin)])
 async def update_product_endpoint(product_id: int, product: dict):
     updated_product = await update_product(
         product_id,
@@ -31,19 +271,28 @@ async def update_product_endpoint(product_id: int, product: dict):
     )
     if not updated_product:
         raise HTTPException(status_code=404, detail="Product not found")
+    await invalidate_catalog()
+    stock_events.record([product_id])
     return updated_product
 
-@router.delete("/products/{product_id}")
+# Order lines keep the product's name and price; their product_id becomes NULL
+@router.delete("/products/{product_id}", dependencies=[Depends(require_admin)])
 async def delete_product_endpoint(product_id: int):
-    deleted_product = await delete_product(product_id)
+    try:
+        deleted_product = await delete_product(product_id)
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=409, detail="Product is still referenced and cannot be deleted")
+    await invalidate_catalog()
     return {"message": "Product deleted", "product": deleted_product}
-<<<<<<< Updated upstream
-=======
 
-@router.get("/products/{product_id}")
-async def read_product(product_id: int):
-    product = await get_product_by_id(product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
->>>>>>> Stashed changes
+@router.get("/products/{product_id}", response_model=Product)
+async def read_product(request: Request, product_id: int):
+    key = f"product:{product_id}"
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        product = await get_product_by_id(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        entry = catalog_cache.set(key, from_record(Product, product), version=version)
+    return cached_response(request, entry)
@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from auth import Principal, current_principal, decode_token, issue_tokens, revoke
+from responses import ORJSONResponse
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Pydantic model for exchanging a refresh token
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+# Pydantic model for logout; the refresh token is optional
+class TokenLogout(BaseModel):
+    refresh_token: Optional[str] = None
+
+
+# Endpoint to trade a refresh token for a new token pair. Refresh tokens are single use:
+# the old one is revoked, and presenting it again is rejected.
+@router.post("/auth/refresh")
+async def refresh_tokens(body: TokenRefresh):
+    claims = decode_token(body.refresh_token, "refresh")
+    if claims is None or not await revoke(claims):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    return issue_tokens(int(claims["sub"]), claims["role"])
+
+# Endpoint to log out: revokes the current access token and, if given, the refresh token
+@router.post("/auth/logout")
+async def logout(body: TokenLogout, principal: Principal = Depends(current_principal)):
+    await revoke(principal.claims)
+    if body.refresh_token:
+        claims = decode_token(body.refresh_token, "refresh")
+        if claims is not None and claims["sub"] == principal.claims["sub"]:
+            await revoke(claims)
+    return {"detail": "Logged out"}
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, FastAPI, HTTPException
+from dataclasses import dataclass
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from asyncpg.exceptions import ForeignKeyViolationError, UniqueViolationError
 from database import *
+from responses import ORJSONResponse
+from auth import issue_tokens, require_user
+from passwords import DUMMY_HASH, hash_password, verify_password
 
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 # Pydantic model for user creation
@@ -26,7 +31,6 @@ class UserUpdate(BaseModel):
 class User(BaseModel):
    user_id: int
    username: str
-   password_hash: str
    email: str
    created_at: datetime
 
@@ -37,6 +41,20 @@ class UserLogin(BaseModel):
    password_hash: str
 
 
+# What the endpoints actually send: a slot dataclass that orjson encodes directly, skipping
+# response_model validation (User above still documents the shape)
+@dataclass(slots=True)
+class UserRecord:
+   user_id: int
+   username: str
+   email: str
+   created_at: datetime
+
+
+def user_response(record):
+   return ORJSONResponse(UserRecord(record["user_id"], record["username"], record["email"], record["created_at"]))
+
+
 # Endpoint to create a new user
 @router.post("/users/create", response_model=User)
 async def create_user(user: UserCreate):
@@ -46,36 +64,43 @@ async def create_user(user: UserCreate):
        raise HTTPException(status_code=400, detail="Username already exists")
 
 
-   result = await insert_user(user.username, user.password_hash, user.email)
+   try:
+       result = await insert_user(user.username, await hash_password(user.password_hash), user.email)
+   except UniqueViolationError:
+       raise HTTPException(status_code=400, detail="Username or email already exists")
    if result is None:
        raise HTTPException(status_code=400, detail="Error creating user")
-   return result
+   return user_response(result)
 
 
 
 
 # Endpoint to get a user by user_id
-@router.get("/users/{user_id}", response_model=User)
+@router.get("/users/{user_id}", response_model=User, dependencies=[Depends(require_user)])
 async def read_user(user_id: int):
    result = await get_user(user_id)
    if result is None:
        raise HTTPException(status_code=404, detail="User not found")
-   return result
+   return user_response(result)
 
 
 # Endpoint to update a user
-@router.put("/users/{user_id}", response_model=User)
+@router.put("/users/{user_id}", response_model=User, dependencies=[Depends(require_user)])
 async def update_user_endpoint(user_id: int, user: UserUpdate):
-   result = await update_user(user_id, user.username, user.password_hash, user.email)
+   password_hash = None if user.password_hash is None else await hash_password(user.password_hash)
+   result = await update_user(user_id, user.username, password_hash, user.email)
    if result is None:
        raise HTTPException(status_code=404, detail="User not found")
-   return result
+   return user_response(result)
 
 
-# Endpoint to delete a user
-@router.delete("/users/{user_id}")
+# Endpoint to delete a user; their cart goes with them, their orders are kept without a user
+@router.delete("/users/{user_id}", dependencies=[Depends(require_user)])
 async def delete_user_endpoint(user_id: int):
-   result = await delete_user(user_id)
+   try:
+       result = await delete_user(user_id)
+   except ForeignKeyViolationError:
+       raise HTTPException(status_code=409, detail="User is still referenced and cannot be deleted")
    if result is None:
        raise HTTPException(status_code=404, detail="User not found")
    return {"detail": "User deleted"}
@@ -85,16 +110,23 @@ async def delete_user_endpoint(user_id: int):
 @router.post("/users/login")
 async def login_user(user: UserLogin):
    # Fetch user from the database
-   db_user = await get_user_by_email(user.email,user.password_hash)
-  
-   if db_user is None:
+   db_user = await get_user_by_email(user.email)
+
+   # Verify off the event loop; unknown emails cost the same as wrong passwords
+   matches, new_hash = await verify_password(user.password_hash, DUMMY_HASH if db_user is None else db_user.password_hash)
+   if db_user is None or not matches:
        raise HTTPException(status_code=404, detail="Wrong password")
 
+   # Upgrade legacy plaintext rows and outdated hashes now that we know the password
+   if new_hash is not None:
+       await update_user_password(db_user.user_id, new_hash)
+
 
    # If login is successful, you can return user info (omit password hash)
-   return {
+   return ORJSONResponse({
        "user_id": db_user.user_id,
        "username": db_user.username,
        "email": db_user.email,
-       "created_at": db_user.created_at
-   }
+       "created_at": db_user.created_at,
+       **issue_tokens(db_user.user_id, "user")
+   })
@@ -0,0 +1,72 @@
+"""Production server: several uvicorn worker processes behind one port.
+
+Migrations run once here, before the workers start, instead of in every worker.
+On SIGTERM each worker stops accepting connections, answers new requests on open
+connections with 503 + Retry-After, ends event streams, and waits up to
+GRACEFUL_TIMEOUT seconds for in-flight requests before closing its DB pool.
+
+AUTH_SECRET must be set, so every worker signs and verifies tokens with the same key.
+
+Workers write their metrics to METRICS_DIR (a fresh temporary directory unless set), so
+/metrics and /api/stats/pool report the whole server whichever worker answers.
+
+    python serve.py                      # WEB_CONCURRENCY workers (default: CPU count)
+    WEB_CONCURRENCY=4 PORT=8000 python serve.py
+
+For development use `uvicorn app:app --reload` instead.
+"""
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+import uvicorn
+from migrations import run_migrations
+# Fails here, before any worker starts, when AUTH_SECRET is missing
+import auth  # noqa: F401
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Each worker has its own DB pool (DB_POOL_MAX_SIZE), so workers x pool size must fit max_connections
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "20"))
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "5"))
+
+
+# Directory the workers share their metrics through; files left by an earlier run are
+# removed so its counts are not added to this one's
+def prepare_metrics_dir():
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        directory = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="pgro-metrics-")
+        return directory, True
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+    return directory, False
+
+
+def main():
+    if os.getenv("RUN_MIGRATIONS", "1") == "1":
+        applied = asyncio.run(run_migrations())
+        print(f"Applied {len(applied)} migration(s)")
+        os.environ["RUN_MIGRATIONS"] = "0"
+    metrics_dir, temporary = prepare_metrics_dir()
+    try:
+        uvicorn.run(
+            "app:app",
+            host=HOST,
+            port=PORT,
+            workers=WEB_CONCURRENCY,
+            timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+            timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+            proxy_headers=True,
+            access_log=os.getenv("ACCESS_LOG", "0") == "1",
+        )
+    finally:
+        if temporary:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# auth refuses to import without a signing key
+os.environ.setdefault("AUTH_SECRET", "test-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import asyncio
+
+from admission import AdmissionControl, AdmissionMiddleware
+
+
+def call(control, path):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = AdmissionMiddleware(app, control)
+    asyncio.run(middleware({"type": "http", "path": path, "method": "GET", "headers": []}, None, send))
+    return sent[0]["status"]
+
+
+def test_draining_refuses_new_event_streams():
+    control = AdmissionControl(10, 10, 1, lambda: 0)
+    assert call(control, "/api/products/events") == 200
+    control.draining = True
+    assert call(control, "/api/products/events") == 503
+    assert call(control, "/api/products") == 503
+
+
+def test_draining_still_serves_metrics():
+    control = AdmissionControl(10, 10, 1, lambda: 0)
+    control.draining = True
+    assert call(control, "/metrics") == 200
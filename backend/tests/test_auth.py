@@ -0,0 +1,138 @@
+import asyncio
+import base64
+import json
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+import auth
+from auth import Principal, check_owner, create_token, current_principal, decode_token, issue_tokens, revoke
+from routes.tokens import TokenRefresh, refresh_tokens
+
+
+# In-memory stand-in for the revoked_tokens table (INSERT ... ON CONFLICT DO NOTHING RETURNING jti)
+@pytest.fixture
+def revoked(monkeypatch):
+    rows = {}
+
+    async def revoke_token(jti, kind, expires_at):
+        if jti in rows:
+            return None
+        rows[jti] = kind
+        return jti
+
+    async def notify(channel, payload):
+        pass
+
+    monkeypatch.setattr(auth, "revoke_token", revoke_token)
+    monkeypatch.setattr(auth, "notify", notify)
+    monkeypatch.setattr(auth, "revocation_list", auth.RevocationList(60))
+    return rows
+
+
+def encode_part(data: dict):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def test_valid_token_round_trips():
+    token, claims = create_token(7, "user", "access", 60)
+    assert decode_token(token, "access") == claims
+
+
+def test_tampered_payload_is_rejected():
+    token, claims = create_token(7, "user", "access", 60)
+    header, _, signature = token.split(".")
+    forged = ".".join([header, encode_part({**claims, "sub": "1", "role": "admin"}), signature])
+    assert decode_token(forged, "access") is None
+
+
+def test_tampered_signature_is_rejected():
+    token, _ = create_token(7, "user", "access", 60)
+    signature = token.rsplit(".", 1)[1]
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    assert decode_token(token.rsplit(".", 1)[0] + "." + flipped, "access") is None
+
+
+def test_token_signed_with_another_key_is_rejected(monkeypatch):
+    token, _ = create_token(7, "user", "access", 60)
+    monkeypatch.setattr(auth, "AUTH_SECRET", b"some-other-key")
+    assert decode_token(token, "access") is None
+
+
+@pytest.mark.parametrize("token", ["", "garbage", "a.b", "a.b.c", "..."])
+def test_malformed_token_is_rejected(token):
+    assert decode_token(token, "access") is None
+
+
+def test_wrong_kind_is_rejected():
+    tokens = issue_tokens(7, "user")
+    assert decode_token(tokens["refresh_token"], "access") is None
+    assert decode_token(tokens["access_token"], "refresh") is None
+
+
+def test_expired_token_is_rejected():
+    token, _ = create_token(7, "user", "access", -1)
+    assert decode_token(token, "access") is None
+
+
+def test_refresh_token_is_single_use(revoked):
+    refresh_token = issue_tokens(7, "user")["refresh_token"]
+    tokens = asyncio.run(refresh_tokens(TokenRefresh(refresh_token=refresh_token)))
+    assert decode_token(tokens["access_token"], "access")["sub"] == "7"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(refresh_tokens(TokenRefresh(refresh_token=refresh_token)))
+    assert exc.value.status_code == 401
+
+
+def test_revoke_reports_replay(revoked):
+    _, claims = create_token(7, "user", "refresh", 60)
+    assert asyncio.run(revoke(claims)) is True
+    assert asyncio.run(revoke(claims)) is False
+
+
+def test_revoked_access_token_is_rejected(revoked):
+    token, claims = create_token(7, "user", "access", 60)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    assert asyncio.run(current_principal(credentials)).subject == 7
+    asyncio.run(revoke(claims))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(current_principal(credentials))
+    assert exc.value.status_code == 401
+
+
+def test_missing_credentials_are_rejected():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(current_principal(None))
+    assert exc.value.status_code == 401
+
+
+def principal(subject: int, role: str):
+    now = int(time.time())
+    return Principal({"sub": str(subject), "role": role, "typ": "access", "iat": now, "exp": now + 60, "jti": "x"})
+
+
+def test_user_may_act_on_own_account():
+    check_owner(principal(7, "user"), 7)
+
+
+def test_user_may_not_act_on_another_account():
+    with pytest.raises(HTTPException) as exc:
+        check_owner(principal(7, "user"), 8)
+    assert exc.value.status_code == 403
+
+
+def test_admin_may_act_on_any_account():
+    check_owner(principal(1, "admin"), 7)
+
+
+def test_unknown_role_is_denied_even_with_matching_id():
+    with pytest.raises(HTTPException) as exc:
+        check_owner(principal(7, "service"), 7)
+    assert exc.value.status_code == 403
+
+
+def test_require_admin_rejects_users():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.require_admin(principal(7, "user")))
+    assert exc.value.status_code == 403
+    assert asyncio.run(auth.require_admin(principal(1, "admin"))).role == "admin"
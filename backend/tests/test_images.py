@@ -0,0 +1,35 @@
+import os
+import time
+
+import images
+from images import image_status_sync, mark_image_failed_sync, reclaim_original_sync, store_original_sync
+
+KEY = "0" * 32
+
+
+def test_upload_is_processing_until_variants_exist(tmp_path):
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("missing", None)
+    store_original_sync(b"data", KEY, "PNG", root=str(tmp_path))
+    assert (tmp_path / KEY / "original.png").read_bytes() == b"data"
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("processing", None)
+    for variant in images.IMAGE_VARIANTS:
+        for ext in images.IMAGE_FORMATS:
+            (tmp_path / KEY / f"{variant}.{ext}").write_bytes(b"")
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("ready", None)
+
+
+def test_failure_is_reported_and_cleared_by_a_new_upload(tmp_path):
+    store_original_sync(b"data", KEY, "PNG", root=str(tmp_path))
+    mark_image_failed_sync(KEY, "broken", root=str(tmp_path))
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("failed", "broken")
+    store_original_sync(b"data", KEY, "PNG", root=str(tmp_path))
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("processing", None)
+
+
+def test_lost_processing_is_stalled_until_reclaimed(tmp_path):
+    original = store_original_sync(b"data", KEY, "PNG", root=str(tmp_path))
+    old = time.time() - images.IMAGE_PROCESSING_TIMEOUT - 1
+    os.utime(original, (old, old))
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("stalled", None)
+    assert reclaim_original_sync(KEY, root=str(tmp_path)) == b"data"
+    assert image_status_sync(KEY, root=str(tmp_path)) == ("processing", None)
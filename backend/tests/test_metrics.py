@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import metrics
+from metrics import Counter, Histogram
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_counter_snapshots_merge():
+    a, b = Counter("c", "test", ("route",)), Counter("c", "test", ("route",))
+    a.inc(("/x",))
+    b.inc(("/x",), 2)
+    b.inc(("/y",))
+    values = {}
+    Counter.merge(values, a.snapshot())
+    Counter.merge(values, b.snapshot())
+    assert values == {("/x",): 3, ("/y",): 1}
+
+
+def test_histogram_snapshots_merge():
+    a, b = Histogram("h", "test", ("q",), buckets=(0.1, 1.0)), Histogram("h", "test", ("q",), buckets=(0.1, 1.0))
+    a.observe(("q",), 0.05)
+    b.observe(("q",), 0.5)
+    b.observe(("q",), 5.0)
+    values = {}
+    Histogram.merge(values, a.snapshot())
+    Histogram.merge(values, b.snapshot())
+    assert values == {("q",): [[1, 1, 1], 5.55, 3]}
+
+
+def test_render_sums_every_worker(metrics_dir, monkeypatch):
+    pool = {key: 1 for key in metrics.POOL_GAUGES + metrics.POOL_COUNTERS}
+    other = Counter("http_requests_shed_total", "test", ("reason",))
+    other.inc(("draining",), 4)
+    # Another live worker (the test runner's parent) and one that has exited
+    (metrics_dir / "1.json").write_text(metrics.json.dumps({"pid": os.getppid(), "metrics": {other.name: other.snapshot()}, "pool": pool}))
+    (metrics_dir / "2.json").write_text(metrics.json.dumps({"pid": 2 ** 22 + 1, "metrics": {other.name: other.snapshot()}, "pool": pool}))
+    monkeypatch.setattr(metrics.http_shed, "_values", {("draining",): 1})
+
+    text = metrics.render_metrics(pool)
+
+    assert 'http_requests_shed_total{reason="draining"} 9' in text
+    # Pool gauges only count workers that are still running
+    assert "db_pool_in_use 2" in text
+    stats = metrics.collect_pool_stats(pool)
+    assert stats["size"] == 2
+    assert sorted(worker["pid"] for worker in stats["workers"]) == sorted([os.getpid(), os.getppid()])
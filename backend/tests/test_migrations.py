@@ -0,0 +1,18 @@
+from migrations import Migration, load_migrations
+
+
+def test_statements_split_at_line_end_semicolons():
+    migration = Migration(1, "t", "-- migrate: no-transaction\n-- comment\nCREATE INDEX a ON t (x);\n\nDROP INDEX b;\n")
+    assert migration.statements() == ["CREATE INDEX a ON t (x)", "DROP INDEX b"]
+
+
+def test_statements_keep_do_blocks_whole():
+    sql = "-- migrate: no-transaction\nDO $$\nBEGIN\n    -- inside\n    PERFORM 1;\nEND\n$$;\nCREATE INDEX a ON t (x);\n"
+    assert Migration(1, "t", sql).statements() == ["DO $$\nBEGIN\n    -- inside\n    PERFORM 1;\nEND\n$$", "CREATE INDEX a ON t (x)"]
+
+
+def test_login_indexes_do_not_use_constraint_names():
+    migration = next(migration for migration in load_migrations() if migration.name == "login_indexes")
+    statements = migration.statements()
+    assert not any("_key" in statement for statement in statements)
+    assert all(statement.startswith("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS") for statement in statements[1:])
@@ -0,0 +1,114 @@
+import asyncio
+from decimal import Decimal
+
+import database
+import recommendations
+from cache import CatalogCache
+from recommendations import RecommendationPool, RecommendedProduct
+
+
+def stock(*changes):
+    items = ",".join(f'{{"op":"stock","id":{id},"quantity":{quantity}}}' for id, quantity in changes)
+    return f'{{"op":"batch","changes":[{items}]}}'
+
+
+def test_stock_change_evicts_only_changed_products():
+    cache = CatalogCache(16, 60)
+    for key in ("product:1", "product:2", "products:100:None:id,quantity"):
+        cache.set(key, {"key": key})
+    version = cache.version
+
+    cache.on_product_change(stock((1, 4)))
+
+    assert cache.get("product:1") is None
+    assert cache.get("product:2") is not None
+    # Pages showing stock are left to their short TTL
+    assert cache.get("products:100:None:id,quantity") is not None
+    # A read that started before the event is not kept
+    assert cache.set("product:1", {}, version=version) and cache.get("product:1") is None
+
+
+def test_catalog_change_evicts_pages():
+    cache = CatalogCache(16, 60)
+    for key in ("product:2", "products:100:None:id,name", "search:10:0:widget"):
+        cache.set(key, {"key": key})
+    cache.on_product_change('{"op":"batch","changes":[{"op":"updated","id":1}]}')
+    assert cache.get("products:100:None:id,name") is None
+    assert cache.get("search:10:0:widget") is None
+    assert cache.get("product:2") is not None
+
+
+def test_entries_can_have_a_shorter_ttl():
+    cache = CatalogCache(16, 60)
+    cache.set("search:10:0:widget", {}, ttl=-1)
+    assert cache.get("search:10:0:widget") is None
+
+
+def test_resync_clears_cache():
+    cache = CatalogCache(16, 60)
+    cache.set("product:2", {})
+    cache.on_product_change('{"op":"resync"}')
+    assert cache.get("product:2") is None
+
+
+def pool_with(*quantities):
+    pool = RecommendationPool(10, 60)
+    pool._swap([RecommendedProduct(id, f"p{id}", Decimal("1"), quantity, None, None) for id, quantity in enumerate(quantities, 1)])
+    return pool
+
+
+def test_stock_change_updates_recommendation_pool():
+    pool = pool_with(5, 5, 5)
+    pool.on_product_change(stock((1, 0), (2, 9), (42, 3)))
+    assert [(product.id, product.quantity) for product in pool._products] == [(2, 9), (3, 5)]
+    assert pool._cum_weights == [9, 14]
+    assert not pool._stale.is_set()
+
+
+def test_catalog_edit_rebuilds_recommendation_pool():
+    pool = pool_with(5)
+    pool.on_product_change('{"op":"batch","changes":[{"op":"updated","id":1}]}')
+    assert pool._stale.is_set()
+
+
+def test_stale_marks_share_one_rebuild_per_min_interval(monkeypatch):
+    calls = []
+
+    async def candidates(limit):
+        calls.append(limit)
+        return []
+
+    monkeypatch.setattr(recommendations, "get_recommendation_candidates", candidates)
+
+    async def main():
+        pool = RecommendationPool(10, 60, min_interval=0.5)
+        await pool.start()
+        for _ in range(10):
+            pool.mark_stale()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.6)
+        await pool.stop()
+
+    asyncio.run(main())
+    # The initial load plus one rebuild for the whole burst
+    assert len(calls) == 2
+
+
+def test_candidates_probe_random_ids(monkeypatch):
+    catalog = {i: i % 3 for i in range(1, 1001)}  # a third of the catalog is sold out
+    probes = []
+
+    class Router:
+        async def fetch_one(self, query, values=None):
+            return {"low": 1, "high": 1000}
+
+        async def fetch_all(self, query, values=None):
+            probes.append(values["ids"])
+            return [{"id": i, "quantity": catalog[i]} for i in values["ids"] if catalog.get(i)]
+
+    monkeypatch.setattr(database, "replica_router", Router())
+    rows = asyncio.run(database.get_recommendation_candidates(50))
+
+    assert len(rows) == 50 and len({row["id"] for row in rows}) == 50
+    assert all(row["quantity"] > 0 for row in rows)
+    assert sum(len(probe) for probe in probes) < len(catalog)
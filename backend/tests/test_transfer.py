@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from transfer import read_csv_header
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def read(chunks):
+    columns, body = await read_csv_header(stream(*chunks))
+    return columns, b"".join([chunk async for chunk in body])
+
+
+def test_header_maps_columns_in_file_order():
+    columns, body = asyncio.run(read([b"\xef\xbb\xbfname,price,id,", b"quantity,image_url,description\r\n1,2", b",3\n"]))
+    assert columns == ("name", "price", "id", "quantity", "image_url", "description")
+    assert body == b"1,2,3\n"
+
+
+@pytest.mark.parametrize("header", [
+    b"name,price,quantity\n",
+    b"id,name,price,quantity,description,image_url,extra\n",
+    b"id,name,name,quantity,description,image_url\n",
+    b"1,Widget,9.99,5,,\n",
+    b"",
+])
+def test_header_must_name_every_column_once(header):
+    with pytest.raises(ValueError):
+        asyncio.run(read([header]))
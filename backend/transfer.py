@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from database import PRODUCT_TRANSFER_COLUMNS
+
+# Rows per chunk written to the client while exporting
+EXPORT_CHUNK_ROWS = 500
+# Longest CSV header row accepted on import
+MAX_CSV_HEADER_BYTES = 64 * 1024
+
+
+# Split a byte stream into lines without holding more than one chunk in memory
+async def iter_lines(stream):
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+# Read the header row of an uploaded CSV. It must name every PRODUCT_TRANSFER_COLUMNS
+# column once, in any order. Returns the columns in file order and the rest of the stream.
+async def read_csv_header(stream):
+    chunks = stream.__aiter__()
+    buffer = b""
+    while b"\n" not in buffer:
+        if len(buffer) > MAX_CSV_HEADER_BYTES:
+            raise ValueError("CSV header row is too long")
+        try:
+            buffer += await chunks.__anext__()
+        except StopAsyncIteration:
+            break
+    line, _, rest = buffer.partition(b"\n")
+    try:
+        header = next(csv.reader([line.decode("utf-8-sig")]), [])
+    except UnicodeDecodeError as exc:
+        raise ValueError("CSV header row is not UTF-8") from exc
+    columns = tuple(name.strip() for name in header)
+    if sorted(columns) != sorted(PRODUCT_TRANSFER_COLUMNS):
+        raise ValueError(
+            f"CSV header must name the columns {', '.join(PRODUCT_TRANSFER_COLUMNS)} once each; "
+            f"got {', '.join(columns) or 'no header'}"
+        )
+
+    async def body():
+        if rest:
+            yield rest
+        async for chunk in chunks:
+            yield chunk
+
+    return columns, body()
+
+
+# Parse NDJSON product lines into COPY records
+async def ndjson_records(stream):
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            price = item.get("price")
+            yield (
+                item.get("id"),
+                item["name"],
+                None if price is None else Decimal(str(price)),
+                item.get("quantity", 0),
+                item.get("description"),
+                item.get("image_url"),
+            )
+        except (ValueError, KeyError, TypeError, InvalidOperation) as exc:
+            raise ValueError(f"Bad NDJSON line: {line[:200]!r}") from exc
+
+
+# Encode exported rows as CSV (with a header) in chunks
+async def csv_chunks(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(PRODUCT_TRANSFER_COLUMNS)
+    rows = 0
+    async for record in records:
+        writer.writerow(tuple(record))
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# Encode exported rows as NDJSON in chunks
+async def ndjson_chunks(records):
+    lines = []
+    async for record in records:
+        lines.append(json.dumps(dict(record.items()), default=float, ensure_ascii=False))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
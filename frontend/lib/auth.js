@@ -0,0 +1,57 @@
+// Access/refresh tokens issued by /api/users/login and /api/admin/login
+
+// Customer and admin ids are separate number spaces, so each is kept under its own key
+// and a session only ever holds one of them
+export const saveSession = (data) => {
+  localStorage.setItem('accessToken', data.access_token);
+  localStorage.setItem('refreshToken', data.refresh_token);
+  if (data.admin_id !== undefined) {
+    localStorage.setItem('role', 'admin');
+    localStorage.setItem('adminId', data.admin_id);
+    localStorage.removeItem('userId');
+  } else {
+    localStorage.setItem('role', 'user');
+    localStorage.setItem('userId', data.user_id);
+    localStorage.removeItem('adminId');
+  }
+};
+
+export const getRole = () => localStorage.getItem('role');
+
+// Id of the logged-in customer, or null when this is not a customer session
+export const getUserId = () => {
+  const userId = localStorage.getItem('userId');
+  return getRole() === 'user' && userId ? Number(userId) : null;
+};
+
+const refreshSession = async () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return false;
+  }
+  const response = await fetch('/api/auth/refresh', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+  if (!response.ok) {
+    return false;
+  }
+  const data = await response.json();
+  localStorage.setItem('accessToken', data.access_token);
+  localStorage.setItem('refreshToken', data.refresh_token);
+  return true;
+};
+
+// fetch() with the access token attached; refreshes the token once when it has expired
+export const authFetch = async (url, options = {}) => {
+  const send = () => fetch(url, {
+    ...options,
+    headers: { ...options.headers, Authorization: `Bearer ${localStorage.getItem('accessToken')}` },
+  });
+  const response = await send();
+  if (response.status === 401 && await refreshSession()) {
+    return send();
+  }
+  return response;
+};
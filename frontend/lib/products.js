@@ -0,0 +1,13 @@
+// One page of /api/products. The next page starts after `cursor`, the X-Next-Cursor
+// header of the previous page; nextCursor is null on the last page.
+export const fetchProductPage = async (cursor = null, params = {}) => {
+  const query = new URLSearchParams(params);
+  if (cursor !== null) {
+    query.set('cursor', cursor);
+  }
+  const response = await fetch(`/api/products?${query}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch products');
+  }
+  return { products: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+};
@@ -13,6 +13,10 @@ const nextConfig = {
         source: "/api/:path*",
         destination: `${API_URL}/api/:path*`, // Rewrites API requests to the backend service
       },
+      {
+        source: "/static/images/:path*",
+        destination: `${API_URL}/static/images/:path*`, // Uploaded product images and their resized variants
+      },
     ];
   },
   webpack: (config, { isServer }) => {
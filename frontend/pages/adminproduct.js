@@ -1,63 +1,88 @@
-import React, { useEffect, useState } from 'react';
-<<<<<<< Updated upstream
+import React, { useEffect, useRef, useState } from 'react';
+import { authFetch } from '../lib/auth';
+import { fetchProductPage } from '../lib/products';
 import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Paper, Button, Box } from '@mui/material';
 import AddProductModal from './AddProductModal'; // อาจจะยังคงใช้สำหรับการเพิ่มผลิตภัณฑ์
 import EditProductModal from './EditProductModal'; // นำเข้า Modal ใหม่
-=======
-import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Paper, Button, Box } from '@mui/material'; 
-import AddProductModal from './AddProductModal'; 
-import EditProductModal from './EditProductModal'; 
->>>>>>> Stashed changes
 
 const ProductTable = () => {
     const [products, setProducts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [isAddModalOpen, setIsAddModalOpen] = useState(false);
-<<<<<<< Updated upstream
     const [isEditModalOpen, setIsEditModalOpen] = useState(false); // เพิ่ม state สำหรับ Modal แก้ไข
-=======
-    const [isEditModalOpen, setIsEditModalOpen] = useState(false); 
->>>>>>> Stashed changes
     const [loading, setLoading] = useState(true);
     const [currentProduct, setCurrentProduct] = useState(null);
+    // Mirrors nextCursor for the event listener, which is registered once
+    const allLoaded = useRef(false);
 
-    const fetchProducts = async () => {
-        const response = await fetch('/api/products');
-        const data = await response.json();
-        setProducts(data);
+    // First page when cursor is null, otherwise the page after it appended to the table.
+    // Rows already in the table (e.g. added by an event) are not appended twice.
+    const fetchProducts = async (cursor = null) => {
+        const page = await fetchProductPage(cursor);
+        setProducts((current) => {
+            if (cursor === null) {
+                return page.products;
+            }
+            const loaded = new Set(current.map((product) => product.id));
+            return [...current, ...page.products.filter((product) => !loaded.has(product.id))];
+        });
+        setNextCursor(page.nextCursor);
+        allLoaded.current = page.nextCursor === null;
         setLoading(false);
     };
 
+    // Apply a batch of changes from /api/products/events instead of refetching the whole list
+    const applyProductEvent = (event) => {
+        const { changes } = JSON.parse(event.data);
+        setProducts((current) => changes.reduce((products, change) => {
+            if (change.op === 'deleted') {
+                return products.filter((product) => product.id !== change.id);
+            }
+            if (change.op === 'stock') {
+                return products.map((product) => (product.id === change.id ? { ...product, quantity: change.quantity } : product));
+            }
+            const { op, ...changed } = change;
+            if (products.some((product) => product.id === changed.id)) {
+                return products.map((product) => (product.id === changed.id ? { ...product, ...changed } : product));
+            }
+            // New ids sort after every loaded row; until the last page is loaded, "Load more" brings them in
+            return allLoaded.current ? [...products, changed] : products;
+        }, current));
+    };
+
     useEffect(() => {
         fetchProducts();
+        const events = new EventSource('/api/products/events');
+        events.addEventListener('product', applyProductEvent);
+        // Sent when events may have been missed (server restart, listener reconnect)
+        events.addEventListener('resync', () => fetchProducts());
+        return () => events.close();
     }, []);
 
     const handleAddProduct = async (newProduct) => {
-        await fetch('/api/products', {
+        await authFetch('/api/products', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify(newProduct),
         });
-        fetchProducts();
     };
 
     const handleEditProduct = async (updatedProduct) => {
-        await fetch(`/api/products/${updatedProduct.id}`, {
+        await authFetch(`/api/products/${updatedProduct.id}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify(updatedProduct),
         });
-        fetchProducts();
     };
 
     const handleDeleteProduct = async (id) => {
-        await fetch(`/api/products/${id}`, {
+        await authFetch(`/api/products/${id}`, {
             method: 'DELETE',
         });
-        fetchProducts();
     };
 
     const openEditModal = (product) => {
@@ -123,6 +148,13 @@ const ProductTable = () => {
                     </TableBody>
                 </Table>
             </TableContainer>
+            {nextCursor !== null && (
+                <Box display="flex" justifyContent="center" mt={2}>
+                    <Button variant="outlined" onClick={() => fetchProducts(nextCursor)}>
+                        Load more
+                    </Button>
+                </Box>
+            )}
             <Box display="flex" justifyContent="center" mt={2}>
                 <Button 
                     variant="contained" 
@@ -139,22 +171,13 @@ const ProductTable = () => {
             <AddProductModal
                 isOpen={isAddModalOpen}
                 onRequestClose={() => setIsAddModalOpen(false)}
-<<<<<<< Updated upstream
                 onAddProduct={handleAddProduct} // ใช้ฟังก์ชันสำหรับเพิ่มผลิตภัณฑ์
-=======
-                onAddProduct={handleAddProduct} 
->>>>>>> Stashed changes
             />
             <EditProductModal
                 isOpen={isEditModalOpen}
                 onRequestClose={() => setIsEditModalOpen(false)}
-<<<<<<< Updated upstream
                 onEditProduct={handleEditProduct} // ฟังก์ชันสำหรับแก้ไขผลิตภัณฑ์
                 product={currentProduct} // ส่งข้อมูลผลิตภัณฑ์ที่กำลังแก้ไขไปยัง Modal
-=======
-                onEditProduct={handleEditProduct} 
-                product={currentProduct} 
->>>>>>> Stashed changes
             />
         </div>
     );
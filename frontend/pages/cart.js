@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { Box, Typography, Button, Grid, Card, CardMedia, CardContent } from '@mui/material';
 import { useRouter } from 'next/router';
 import Navbar from '../components/Navbar';
+import { authFetch, getUserId } from '../lib/auth';
 
 const Cart = () => {
   const router = useRouter();
@@ -9,9 +10,14 @@ const Cart = () => {
   const [loading, setLoading] = useState(true);
 
   const fetchCartItems = async () => {
-    const userId = 1; // Replace with actual user ID from your auth system
+    const userId = getUserId();
+    if (userId === null) {
+      // Admin sessions have no cart of their own
+      router.push('/logincustomer');
+      return;
+    }
     try {
-      const response = await fetch(`/api/cart/${userId}`);
+      const response = await authFetch(`/api/cart/${userId}`);
       if (!response.ok) {
         throw new Error('Failed to fetch cart items');
       }
@@ -15,13 +15,12 @@ const Store = () => {
   // Function to fetch recommended products
   const fetchRecommendedProducts = async () => {
     try {
-      const response = await fetch('/api/products');
+      const response = await fetch('/api/products/recommended?n=3');
       if (!response.ok) {
         throw new Error('Failed to fetch products');
       }
       const data = await response.json();
-      const shuffled = data.sort(() => 0.5 - Math.random()).slice(0, 3);
-      setRecommendedProducts(shuffled);
+      setRecommendedProducts(data);
     } catch (error) {
       console.error('Error fetching recommended products:', error);
     } finally {
@@ -133,7 +132,7 @@ const Store = () => {
                   <CardMedia
                     component="img"
                     height="140"
-                    image={product.image_url}
+                    image={product.images?.card.webp ?? product.image_url}
                     alt={product.name}
                     sx={{ objectFit: 'contain' }} // ทำให้ภาพไม่ยืด
                   />
@@ -2,6 +2,7 @@ import React, { useState } from "react";
 import { TextField, Button, Grid, Typography, Paper, Snackbar, Alert } from '@mui/material';
 import styles from '../styles/adminbg.module.css';
 import { useRouter } from 'next/router';
+import { authFetch, saveSession } from '../lib/auth';
 
 export default function AuthPage() {
   const router = useRouter();
@@ -51,6 +52,7 @@ export default function AuthPage() {
       }
 
       const data = await response.json();
+      saveSession(data);
       setSnackbarMessage('Login successful!');
       setSnackbarSeverity('success');
       setOpenSnackbar(true);
@@ -79,7 +81,8 @@ export default function AuthPage() {
     }
 
     try {
-      const response = await fetch('/api/admin/create', {
+      // Only a signed-in admin may create another admin
+      const response = await authFetch('/api/admin/create', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import { TextField, Button, Grid, Typography, Paper, Snackbar, Alert } from '@mui/material';
 import { useRouter } from 'next/router'; // นำเข้า useRouter
+import { saveSession } from '../lib/auth';
 import styles from '../styles/bg.module.css';
 
 export default function AuthPage() {
@@ -39,6 +40,7 @@ export default function AuthPage() {
       }
 
       const data = await response.json();
+      saveSession(data);
       setSnackbarMessage('Login successful!');
       setSnackbarSeverity('success');
       setOpenSnackbar(true);
@@ -1,21 +1,22 @@
-<<<<<<< Updated upstream
-=======
 import React, { useEffect, useState } from 'react';
 import { Box, Button, Typography, Grid, Dialog, DialogActions, DialogContent, DialogTitle, TextField } from '@mui/material';
 import Navbar from '../components/Navbar';
+import { fetchProductPage } from '../lib/products';
 import { useRouter } from 'next/router';
 
 const Store = () => {
     const [products, setProducts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const router = useRouter();
     const [open, setOpen] = useState(false);
     const [selectedProduct, setSelectedProduct] = useState(null);
     const [quantity, setQuantity] = useState(1);
 
-    const fetchProducts = async () => {
-        const response = await fetch('/api/products');
-        const data = await response.json();
-        setProducts(data);
+    // The grid only needs these columns; image_key brings the resized image URLs
+    const fetchProducts = async (cursor = null) => {
+        const page = await fetchProductPage(cursor, { fields: 'id,name,price,image_url,image_key' });
+        setProducts((current) => (cursor === null ? page.products : [...current, ...page.products]));
+        setNextCursor(page.nextCursor);
     };
 
     useEffect(() => {
@@ -55,7 +56,7 @@ const Store = () => {
                         <Grid item xs={12} sm={6} md={3} key={product.id}>
                             <Box border={1} borderColor="#004d40" borderRadius="8px" padding={2} textAlign="center" bgcolor="#ffffff" boxShadow={3}>
                                 <img 
-                                    src={product.image_url} 
+                                    src={product.images?.card.webp ?? product.image_url} 
                                     alt={product.name} 
                                     style={{ 
                                         width: '60%', 
@@ -79,6 +80,13 @@ const Store = () => {
                     ))
                 )}
             </Grid>
+            {nextCursor !== null && (
+                <Box display="flex" justifyContent="center" mt={3}>
+                    <Button variant="contained" color="secondary" onClick={() => fetchProducts(nextCursor)}>
+                        Load more
+                    </Button>
+                </Box>
+            )}
 
             <Dialog open={open} onClose={() => setOpen(false)}>
                 <DialogTitle>Add to Cart</DialogTitle>
@@ -107,4 +115,3 @@ const Store = () => {
 };
 
 export default Store;
->>>>>>> Stashed changes